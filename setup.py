@@ -12,11 +12,20 @@ setup(name='tap-zendesk',
           'zenpy==2.0.24',
           'backoff==2.0.0',
           'requests==2.25.1',
+          # The Retry policy and the DNS caching connections are built on the urllib3 1.26 API
+          'urllib3>=1.26,<1.27',
       ],
       extras_require={
           'dev': [
               'ipdb',
           ],
+          'orjson': [
+              'orjson',
+          ],
+          'http2': [
+              # The proxy argument of httpx.Client
+              'httpx[http2]>=0.26',
+          ],
           'test': [
               'pylint==2.8.3',
               'nose',
@@ -1,66 +1,130 @@
 #!/usr/bin/env python3
 import json
+import logging
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from zenpy import Zenpy
 import requests
-from requests import Session
 from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import singer
 from singer import metadata, metrics as singer_metrics
 from tap_zendesk import metrics as zendesk_metrics
+from tap_zendesk.cache import ETagCache
+from tap_zendesk.http import CachedDNSAdapter, HTTP2Adapter
 from tap_zendesk.discover import discover_streams
-from tap_zendesk.streams import STREAMS
+from tap_zendesk.streams import STREAMS, CursorBasedStream, get_sub_stream_concurrency
 from tap_zendesk.sync import sync_stream
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 LOGGER = singer.get_logger()
 
 REQUEST_TIMEOUT = 300
 
-REQUIRED_CONFIG_KEYS = [
+# Connection pool sizes of the Session shared by Zenpy and the streams
+POOL_CONNECTIONS = 20
+POOL_MAXSIZE = 50
+
+# Only failed connections are retried here. Error responses, rate limits included, are retried
+# by `call_api`'s backoff and by Zenpy itself, so their `Retry-After` is not waited for twice.
+RETRY = Retry(total=3, respect_retry_after_header=False)
+
+# Records are written to stdout through a buffer of this size instead of being flushed one by one
+STDOUT_BUFFER_SIZE = 1 << 20
+
+REQUIRED_CONFIG_KEYS = frozenset({
     "start_date",
     "subdomain",
-]
+})
 
 # default authentication
-OAUTH_CONFIG_KEYS = [
+OAUTH_CONFIG_KEYS = frozenset({
     "access_token",
-]
+})
 
 # email + api_token authentication
-API_TOKEN_CONFIG_KEYS = [
+API_TOKEN_CONFIG_KEYS = frozenset({
     "email",
     "api_token",
-]
-
-# patch Session.request to record HTTP request metrics
-request = Session.request
-
-def request_metrics_patch(self, method, url, **kwargs):
-    with singer_metrics.http_request_timer(None):
-        response = request(self, method, url, **kwargs)
-        LOGGER.info("Request: %s, Response ETag: %s, Request Id: %s",
-                    url,
-                    response.headers.get('ETag', 'Not present'),
-                    response.headers.get('X-Request-Id', 'Not present'))
+})
+
+class MetricsSession(requests.Session):
+    """ Session recording HTTP request metrics. Only the tap's own Session pays for
+    this, other Sessions in the process are left untouched. """
+    # Set on Sessions built with `etag_cache` enabled, to revalidate cached GET responses
+    etag_cache = None
+
+    def request(self, method, url, **kwargs): # pylint: disable=arguments-differ
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        etag_cache = self.etag_cache
+        cache_key = etag_cache.get_key(method, url, kwargs.get('params')) if etag_cache else None
+        etag = cache_key and etag_cache.get_etag(cache_key)
+        if etag:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), 'If-None-Match': etag}
+
+        start_time = time.monotonic()
+        try:
+            response = super().request(method, url, **kwargs)
+        except Exception:
+            zendesk_metrics.record_http(time.monotonic() - start_time, singer_metrics.Status.failed)
+            raise
+        zendesk_metrics.record_http(time.monotonic() - start_time)
+        # Skip building the log record for every request when INFO is disabled
+        if LOGGER.isEnabledFor(logging.INFO):
+            LOGGER.info("Request: %s, Response ETag: %s, Request Id: %s",
+                        url,
+                        response.headers.get('ETag', 'Not present'),
+                        response.headers.get('X-Request-Id', 'Not present'))
+        if etag and response.status_code == 304:
+            LOGGER.info("Request: %s, Not modified, using the cached response", url)
+            response = etag_cache.restore(cache_key, response)
+        elif cache_key:
+            etag_cache.store(cache_key, response)
         return response
 
-Session.request = request_metrics_patch
-# end patch
+def buffer_stdout():
+    """ Replace stdout with a text stream over a STDOUT_BUFFER_SIZE buffer, so that output is
+    written to the pipe in large chunks rather than line by line. """
+    sys.stdout.flush()
+    # Opened over the file descriptor itself, wrapping `sys.stdout.buffer` would add a second
+    # buffer that a flush of the new stdout does not empty.
+    # Not opened in a `with` block, the stream replaces stdout for the rest of the process.
+    sys.stdout = open(sys.stdout.fileno(), 'w', buffering=STDOUT_BUFFER_SIZE, encoding='utf-8', closefd=False) # pylint: disable=consider-using-with
+
+def write_schemas(schema_messages):
+    """ Write SCHEMA messages with a single write and flush of stdout, rather than one per stream. """
+    sys.stdout.write(''.join(singer.format_message(message) + '\n' for message in schema_messages))
+    sys.stdout.flush()
+
+def dumps_indented(obj):
+    """ Serialize to indented JSON, with orjson if it is installed as it is several times faster. """
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(obj, indent=2)
 
 def do_discover(client, config):
     LOGGER.info("Starting discover")
-    catalog = {"streams": discover_streams(client, config)}
-    json.dump(catalog, sys.stdout, indent=2)
+    streams = discover_streams(client, config)
+    sys.stdout.write(dumps_indented({'streams': streams}))
+    sys.stdout.flush()
     LOGGER.info("Finished discover")
 
 def stream_is_selected(mdata):
     return mdata.get((), {}).get('selected', False)
 
-def get_selected_streams(catalog):
+def get_mdata_by_stream(catalog):
+    return {stream.tap_stream_id: metadata.to_map(stream.metadata) for stream in catalog.streams}
+
+def get_selected_streams(catalog, mdata_by_stream):
     selected_stream_names = []
     for stream in catalog.streams:
-        mdata = metadata.to_map(stream.metadata)
+        mdata = mdata_by_stream[stream.tap_stream_id]
         if stream_is_selected(mdata):
             selected_stream_names.append(stream.tap_stream_id)
     return selected_stream_names
@@ -70,24 +134,22 @@ SUB_STREAMS = {
     'tickets': ['ticket_audits', 'ticket_metrics', 'ticket_comments']
 }
 
-def get_sub_stream_names():
-    sub_stream_names = []
-    for parent_stream in SUB_STREAMS:
-        sub_stream_names.extend(SUB_STREAMS[parent_stream])
-    return sub_stream_names
+# Lookups derived from SUB_STREAMS once at import
+_ALL_SUB_STREAMS = frozenset(sub_stream_name for sub_stream_names in SUB_STREAMS.values()
+                             for sub_stream_name in sub_stream_names)
+_PARENT_OF = {sub_stream_name: parent_stream_name for parent_stream_name, sub_stream_names in SUB_STREAMS.items()
+              for sub_stream_name in sub_stream_names}
 
 class DependencyException(Exception):
     pass
 
 def validate_dependencies(selected_stream_ids):
-    errs = []
     msg_tmpl = ("Unable to extract {0} data. "
                 "To receive {0} data, you also need to select {1}.")
-    for parent_stream_name in SUB_STREAMS:
-        sub_stream_names = SUB_STREAMS[parent_stream_name]
-        for sub_stream_name in sub_stream_names:
-            if sub_stream_name in selected_stream_ids and parent_stream_name not in selected_stream_ids:
-                errs.append(msg_tmpl.format(sub_stream_name, parent_stream_name))
+    selected_stream_set = set(selected_stream_ids)
+    errs = [msg_tmpl.format(stream_id, _PARENT_OF[stream_id])
+            for stream_id in selected_stream_ids
+            if stream_id in _PARENT_OF and _PARENT_OF[stream_id] not in selected_stream_set]
 
     if errs:
         raise DependencyException(" ".join(errs))
@@ -97,61 +159,126 @@ def populate_class_schemas(catalog, selected_stream_names):
         if stream.tap_stream_id in selected_stream_names:
             STREAMS[stream.tap_stream_id].stream = stream
 
+def get_stream_etag(instance, etag=None):
+    """ Return the current ETag of a stream's first page, or None when the stream can't be checked.
+    Only plain cursor based endpoints are checked: their first page is requested with the
+    same parameters on every run, unlike the incremental exports. """
+    if not isinstance(instance, CursorBasedStream) or not instance.etag_checkable:
+        return None
+    return instance.get_etag(etag)
+
+def sync_parent_stream(client, state, config, stream_name):
+    LOGGER.info("%s: Starting sync", stream_name)
+    instance = STREAMS[stream_name](client, config)
+    etag = None
+    if config.get('skip_unchanged_streams'):
+        saved = state.get('etags', {}).get(stream_name)
+        saved = saved if isinstance(saved, dict) else {}
+        etag = get_stream_etag(instance, saved.get('etag'))
+        # The ETag only covers the first page, so only a stream that fitted on it is skipped
+        if etag and etag == saved.get('etag') and saved.get('has_more') is False:
+            LOGGER.info("%s: Skipping - unchanged (ETag match)", stream_name)
+            return 0
+    counter_value = sync_stream(state, config.get('start_date'), instance)
+    if etag:
+        # Only remembered once the stream synced, so a failed sync is retried in full
+        state.setdefault('etags', {})[stream_name] = {'etag': etag, 'has_more': instance.has_more_pages}
+    # singer.write_state(state)
+    LOGGER.info("%s: Completed sync (%s rows)", stream_name, counter_value)
+    return counter_value
+
+def sync_parent_streams_concurrently(client, state, config, stream_names, max_workers):
+    """ Sync independent parent streams on a bounded thread pool. The work is
+    dominated by waiting on the Zendesk API, so overlapping the streams bounds
+    the wall time by the slowest stream rather than the sum of all of them. """
+    # Create the shared bookmarks dict up front, each stream only adds its own key to it
+    state.setdefault('bookmarks', {})
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(sync_parent_stream, client, state, config, stream_name)
+                   for stream_name in stream_names]
+        try:
+            for future in futures:
+                future.result()
+        except Exception:
+            # Don't start streams that are still queued, re-raise the first failure
+            for future in futures:
+                future.cancel()
+            raise
+
+def get_max_concurrent_streams(config):
+    # If value is 0, "0", "" or not passed then streams are synced one after another.
+    max_concurrent_streams = config.get('max_concurrent_streams')
+    if max_concurrent_streams and int(max_concurrent_streams) > 1:
+        return int(max_concurrent_streams)
+    return 1
+
+def get_sync_plan(catalog_stream_names, selected_stream_names):
+    """ Return the names of the streams to write a schema for, in catalog order, and of the
+    parent streams to sync. The schemas of a parent's selected sub-streams follow its own,
+    as the parent syncs them. """
+    schema_stream_names = []
+    parent_stream_names = []
+    for stream_name in catalog_stream_names:
+        if stream_name not in selected_stream_names:
+            continue
+        schema_stream_names.append(stream_name)
+        schema_stream_names.extend(sub_stream_name for sub_stream_name in SUB_STREAMS.get(stream_name, [])
+                                   if sub_stream_name in selected_stream_names)
+        if stream_name not in _ALL_SUB_STREAMS:
+            parent_stream_names.append(stream_name)
+    return schema_stream_names, parent_stream_names
+
 def do_sync(client, catalog, state, config):
+    # Zendesk throttles offset pagination past 100 pages, page the ticket sub-streams by cursor instead
+    config.setdefault('use_cursor_pagination', True)
 
-    selected_stream_names = get_selected_streams(catalog)
+    # Build each stream's metadata map once, it is looked up for every stream and sub-stream below
+    mdata_by_stream = get_mdata_by_stream(catalog)
+    selected_stream_names = get_selected_streams(catalog, mdata_by_stream)
     validate_dependencies(selected_stream_names)
     populate_class_schemas(catalog, selected_stream_names)
-    all_sub_stream_names = get_sub_stream_names()
-
-    for stream in catalog.streams:
-        stream_name = stream.tap_stream_id
-        mdata = metadata.to_map(stream.metadata)
-        if stream_name not in selected_stream_names:
+    key_props_by_stream = {stream_name: metadata.get(mdata_by_stream[stream_name], (), 'table-key-properties')
+                           for stream_name in selected_stream_names}
+    catalog_stream_names = [stream.tap_stream_id for stream in catalog.streams]
+    selected_stream_set = set(selected_stream_names)
+    schema_stream_names, parent_stream_names = get_sync_plan(catalog_stream_names, selected_stream_set)
+
+    for stream_name in catalog_stream_names:
+        if stream_name not in selected_stream_set:
             LOGGER.info("%s: Skipping - not selected", stream_name)
-            continue
-
-        # if starting_stream:
-        #     if starting_stream == stream_name:
-        #         LOGGER.info("%s: Resuming", stream_name)
-        #         starting_stream = None
-        #     else:
-        #         LOGGER.info("%s: Skipping - already synced", stream_name)
-        #         continue
-        # else:
-        #     LOGGER.info("%s: Starting", stream_name)
-
-
-        key_properties = metadata.get(mdata, (), 'table-key-properties')
-        singer.write_schema(stream_name, stream.schema.to_dict(), key_properties)
-
-        sub_stream_names = SUB_STREAMS.get(stream_name)
-        if sub_stream_names:
-            for sub_stream_name in sub_stream_names:
-                if sub_stream_name not in selected_stream_names:
-                    continue
-                sub_stream = STREAMS[sub_stream_name].stream
-                sub_mdata = metadata.to_map(sub_stream.metadata)
-                sub_key_properties = metadata.get(sub_mdata, (), 'table-key-properties')
-                singer.write_schema(sub_stream.tap_stream_id, sub_stream.schema.to_dict(), sub_key_properties)
-
-        # parent stream will sync sub stream
-        if stream_name in all_sub_stream_names:
-            continue
 
-        LOGGER.info("%s: Starting sync", stream_name)
-        instance = STREAMS[stream_name](client, config)
-        counter_value = sync_stream(state, config.get('start_date'), instance)
-        # singer.write_state(state)
-        LOGGER.info("%s: Completed sync (%s rows)", stream_name, counter_value)
-        zendesk_metrics.log_aggregate_rates()
+    write_schemas([singer.SchemaMessage(stream=stream_name,
+                                        schema=STREAMS[stream_name].stream.schema.to_dict(),
+                                        key_properties=key_props_by_stream[stream_name])
+                   for stream_name in schema_stream_names])
+
+    # The parent stream fetches the records of its selected sub-streams on a shared pool
+    sub_stream_executor = None
+    if not _ALL_SUB_STREAMS.isdisjoint(selected_stream_set):
+        sub_stream_executor = ThreadPoolExecutor(max_workers=get_sub_stream_concurrency(config))
+        config['_executor'] = sub_stream_executor
+
+    try:
+        # All schemas are written before any records, so the parent streams can be
+        # synced in any order (or at the same time) from here on.
+        max_workers = get_max_concurrent_streams(config)
+        if max_workers > 1 and len(parent_stream_names) > 1:
+            LOGGER.info("Syncing %s streams with up to %s at a time", len(parent_stream_names), max_workers)
+            sync_parent_streams_concurrently(client, state, config, parent_stream_names, max_workers)
+        else:
+            for stream_name in parent_stream_names:
+                sync_parent_stream(client, state, config, stream_name)
+    finally:
+        if sub_stream_executor:
+            config.pop('_executor')
+            sub_stream_executor.shutdown()
 
     singer.write_state(state)
     LOGGER.info("Finished sync")
     zendesk_metrics.log_aggregate_rates()
 
 def oauth_auth(args):
-    if not set(OAUTH_CONFIG_KEYS).issubset(args.config.keys()):
+    if not OAUTH_CONFIG_KEYS.issubset(args.config):
         LOGGER.debug("OAuth authentication unavailable.")
         return None
 
@@ -162,7 +289,7 @@ def oauth_auth(args):
     }
 
 def api_token_auth(args):
-    if not set(API_TOKEN_CONFIG_KEYS).issubset(args.config.keys()):
+    if not API_TOKEN_CONFIG_KEYS.issubset(args.config):
         LOGGER.debug("API Token authentication unavailable.")
         return None
 
@@ -174,23 +301,38 @@ def api_token_auth(args):
     }
 
 def get_session(config):
-    """ Add partner information to requests Session object if specified in the config. """
-    if not all(k in config for k in ["marketplace_name",
-                                     "marketplace_organization_id",
-                                     "marketplace_app_id"]):
-        return None
-    session = requests.Session()
-    # Using Zenpy's default adapter args, following the method outlined here:
+    """ Build the keep-alive Session shared by Zenpy and the tap's own requests.
+    Add partner information to the Session headers if specified in the config. """
+    session = MetricsSession()
+    # Providing our own adapter, following the method outlined here:
     # https://github.com/facetoe/zenpy/blob/master/docs/zenpy.rst#usage
-    session.mount("https://", HTTPAdapter(**Zenpy.http_adapter_kwargs()))
-    session.headers["X-Zendesk-Marketplace-Name"] = config.get("marketplace_name", "")
-    session.headers["X-Zendesk-Marketplace-Organization-Id"] = str(config.get("marketplace_organization_id", ""))
-    session.headers["X-Zendesk-Marketplace-App-Id"] = str(config.get("marketplace_app_id", ""))
+    # The pool is sized so that concurrently synced streams each keep their connection alive.
+    adapter_class = CachedDNSAdapter if config.get("cache_dns") else HTTPAdapter
+    adapter = adapter_class(pool_connections=POOL_CONNECTIONS,
+                            pool_maxsize=POOL_MAXSIZE,
+                            max_retries=RETRY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if config.get("use_http2"):
+        # Zendesk serves HTTP/2 over TLS, so only https requests are multiplexed
+        session.mount("https://", HTTP2Adapter(max_connections=POOL_CONNECTIONS))
+        # The adapter carrying RETRY and the DNS cache is no longer used for https requests
+        if config.get("cache_dns"):
+            LOGGER.warning("`cache_dns` has no effect when `use_http2` is set.")
+    if all(k in config for k in ["marketplace_name",
+                                 "marketplace_organization_id",
+                                 "marketplace_app_id"]):
+        session.headers["X-Zendesk-Marketplace-Name"] = config.get("marketplace_name", "")
+        session.headers["X-Zendesk-Marketplace-Organization-Id"] = str(config.get("marketplace_organization_id", ""))
+        session.headers["X-Zendesk-Marketplace-App-Id"] = str(config.get("marketplace_app_id", ""))
+    if config.get("etag_cache"):
+        session.etag_cache = ETagCache()
     return session
 
 @singer.utils.handle_top_exception(LOGGER)
 def main():
     parsed_args = singer.utils.parse_args(REQUIRED_CONFIG_KEYS)
+    buffer_stdout()
 
     # Set request timeout to config param `request_timeout` value.
     config_request_timeout = parsed_args.config.get('request_timeout')
@@ -202,16 +344,22 @@ def main():
     creds = oauth_auth(parsed_args) or api_token_auth(parsed_args)
     session = get_session(parsed_args.config)
     client = Zenpy(session=session, timeout=request_timeout, **creds) # Pass request timeout
+    # The streams send their own requests through the same Session to reuse its connections
+    parsed_args.config['_session'] = session
 
     if not client:
         LOGGER.error("""No suitable authentication keys provided.""")
 
-    if parsed_args.discover:
-        # passing the config to check the authentication in the do_discover method
-        do_discover(client, parsed_args.config)
-    elif parsed_args.catalog:
-        state = parsed_args.state
-        do_sync(client, parsed_args.catalog, state, parsed_args.config)
+    try:
+        if parsed_args.discover:
+            # passing the config to check the authentication in the do_discover method
+            do_discover(client, parsed_args.config)
+        elif parsed_args.catalog:
+            state = parsed_args.state
+            do_sync(client, parsed_args.catalog, state, parsed_args.config)
+    finally:
+        if session.etag_cache:
+            session.etag_cache.close()
 
 if __name__=="__main__":
     main()
\ No newline at end of file
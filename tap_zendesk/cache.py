@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import threading
+from urllib.parse import parse_qs, urlsplit
+from requests.models import PreparedRequest
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.tap-zendesk-cache')
+# Responses kept at most, the oldest stored ones are evicted first
+MAX_ENTRIES = 1000
+# The incremental exports are requested from a new start time or cursor on every run, and the audits,
+# comments and metrics of the tickets are requested per ticket, so these responses are never served again
+UNCACHED_PATHS = ('/incremental/', '/tickets/')
+
+class ETagCache():
+    """ On-disk cache of GET response bodies keyed by their url, used to send
+    `If-None-Match` and to rebuild the response when Zendesk answers 304. """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=MAX_ENTRIES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_entries = max_entries
+        # Concurrently synced streams share the Session and so the cache, every use holds the lock
+        self.connection = sqlite3.connect(os.path.join(cache_dir, 'etags.sqlite'), check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS responses '
+                                '(key TEXT PRIMARY KEY, etag TEXT, content BLOB, encoding TEXT)')
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(method, url, params=None):
+        if method.upper() != 'GET' or any(path in url for path in UNCACHED_PATHS):
+            return None
+        prepared = PreparedRequest()
+        prepared.prepare_url(url, params)
+        # Only the first page of a stream is requested again with the same url on the next run
+        query = parse_qs(urlsplit(prepared.url).query)
+        if 'page[after]' in query or query.get('page', ['1']) != ['1']:
+            return None
+        return prepared.url
+
+    def get_etag(self, key):
+        with self.lock:
+            row = self.connection.execute('SELECT etag FROM responses WHERE key = ?', (key,)).fetchone()
+        return row and row[0]
+
+    def store(self, key, response):
+        etag = response.headers.get('ETag')
+        if response.status_code != 200 or not etag:
+            return
+        with self.lock:
+            # A replaced row gets a new, highest rowid, so the rowids order the responses by when they were stored
+            self.connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                                    (key, etag, response.content, response.encoding))
+            # The pages freed by the evicted rows are reused by the next ones, so the file stays bounded too
+            self.connection.execute('DELETE FROM responses WHERE rowid NOT IN '
+                                    '(SELECT rowid FROM responses ORDER BY rowid DESC LIMIT ?)', (self.max_entries,))
+
+    def restore(self, key, response):
+        """ Turn a 304 response into the 200 response that was cached for the same url. """
+        with self.lock:
+            content, encoding = self.connection.execute('SELECT content, encoding FROM responses WHERE key = ?',
+                                                        (key,)).fetchone()
+        response.status_code = 200
+        response.reason = 'OK'
+        response._content = content # pylint: disable=protected-access
+        response.encoding = encoding
+        return response
+
+    def close(self):
+        """ Commit the responses stored during the run in a single transaction. """
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
@@ -25,15 +25,13 @@ def load_shared_schema_refs():
     return shared_schema_refs
 
 def discover_streams(client, config):
-    streams = []
+    """ Check the read access of every stream, then return the discovered streams. """
     error_list = []
-    refs = load_shared_schema_refs()
-
+    instances = []
 
     for stream in STREAMS.values():
         # for each stream in the `STREAMS` check if the user has the permission to access the data of that stream
         stream = stream(client, config)
-        schema = singer.resolve_schema_references(stream.load_schema(), refs)
         try:
             # Here it call the check_access method to check whether stream have read permission or not.
             # If stream does not have read permission then append that stream name to list and at the end of all streams
@@ -55,7 +53,7 @@ def discover_streams(client, config):
             else:
                 raise e from None # raise error if it is other than 403 forbidden error
 
-        streams.append({'stream': stream.name, 'tap_stream_id': stream.name, 'schema': schema, 'metadata': stream.load_metadata()})
+        instances.append(stream)
 
     if error_list:
 
@@ -73,5 +71,10 @@ def discover_streams(client, config):
             # If none of the streams are having the 'read' access, then the code will raise an error
             raise ZendeskForbidden(message)
 
-
-    return streams
+    # Built before any of the catalog is written, as listing the custom fields of a stream may fail
+    refs = load_shared_schema_refs()
+    return [{'stream': stream.name,
+             'tap_stream_id': stream.name,
+             'schema': singer.resolve_schema_references(stream.load_schema(), refs),
+             'metadata': stream.load_metadata()}
+            for stream in instances]
@@ -1,8 +1,23 @@
+import functools
+import os
+import socket
+import ssl
+import threading
 from time import sleep
 import backoff
 import requests
 import singer
+from requests.adapters import BaseAdapter, HTTPAdapter
 from requests.exceptions import Timeout, HTTPError
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, get_encoding_from_headers, select_proxy
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 
 LOGGER = singer.get_logger()
@@ -50,6 +65,127 @@ class ZendeskBadGatewayError(ZendeskBackoff):
 class ZendeskServiceUnavailableError(ZendeskBackoff):
     pass
 
+class HTTP2Adapter(BaseAdapter):
+    """ Transport adapter sending a requests Session's requests with an HTTP/2 httpx client,
+    which multiplexes the concurrent requests to Zendesk over a single connection. """
+
+    def __init__(self, max_connections):
+        super().__init__()
+        if httpx is None:
+            raise Exception("HTTP/2 requires httpx, install it with `pip install 'tap-zendesk[http2]'`.")
+        self.max_connections = max_connections
+        # httpx takes the TLS and proxy settings per client, so there is one client for each of
+        # the settings requests passes to `send`. They are normally the same for every request.
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_ssl_context(verify, cert):
+        """ Build the SSL context for the `verify` and `cert` arguments of requests. """
+        if verify is False:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        elif isinstance(verify, str) and os.path.isdir(verify):
+            context = ssl.create_default_context(capath=verify)
+        elif isinstance(verify, str):
+            context = ssl.create_default_context(cafile=verify)
+        else:
+            context = ssl.create_default_context(cafile=DEFAULT_CA_BUNDLE_PATH)
+        if isinstance(cert, tuple):
+            context.load_cert_chain(*cert)
+        elif cert:
+            context.load_cert_chain(cert)
+        return context
+
+    def get_client(self, verify, cert, proxy):
+        key = (verify, cert, proxy)
+        with self.lock:
+            if key not in self.clients:
+                # The environment was already applied by requests to the arguments
+                self.clients[key] = httpx.Client(http2=True,
+                                                 verify=self.get_ssl_context(verify, cert),
+                                                 proxy=proxy,
+                                                 trust_env=False,
+                                                 limits=httpx.Limits(max_connections=self.max_connections,
+                                                                     max_keepalive_connections=self.max_connections))
+            return self.clients[key]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None): # pylint: disable=too-many-arguments
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+            timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        client = self.get_client(verify, cert, select_proxy(request.url, proxies or {}))
+        try:
+            http2_response = client.request(request.method, request.url, headers=dict(request.headers),
+                                                 content=request.body, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise Timeout(e, request=request) from None
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request) from None
+
+        response = requests.models.Response()
+        response.status_code = http2_response.status_code
+        response.reason = http2_response.reason_phrase
+        response.headers = CaseInsensitiveDict(http2_response.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        # httpx has already read and decompressed the body
+        response._content = http2_response.content # pylint: disable=protected-access
+        response._content_consumed = True # pylint: disable=protected-access
+        return response
+
+    def close(self):
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+
+@functools.lru_cache(maxsize=None)
+def resolve_host(host, port):
+    """ Resolve the IPv4 address of a host once per process. """
+    return socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+
+class CachedDNSConnectionMixin():
+    """ Connect to the cached address of the host. The host name is still used for
+    the Host header, SNI and certificate verification. """
+
+    def _new_conn(self):
+        dns_host = self._dns_host
+        try:
+            self._dns_host = resolve_host(dns_host, self.port)
+        except socket.gaierror:
+            # Leave it to urllib3 to resolve the host again and raise its usual error
+            pass
+        try:
+            return super()._new_conn()
+        finally:
+            # `host` is derived from `_dns_host`, restore it before the TLS handshake
+            self._dns_host = dns_host
+
+class CachedDNSHTTPConnection(CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+class CachedDNSHTTPSConnection(CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+class CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachedDNSHTTPConnection
+
+class CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachedDNSHTTPSConnection
+
+class CachedDNSAdapter(HTTPAdapter):
+    """ HTTPAdapter looking up the DNS of each host only for the first connection to it. """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CachedDNSHTTPConnectionPool,
+            'https': CachedDNSHTTPSConnectionPool,
+        }
+
 ERROR_CODE_EXCEPTION_MAPPING = {
     400: {
         "raise_exception": ZendeskBadRequest,
@@ -123,11 +259,12 @@ def raise_for_error(response):
     This method map the status code with `ERROR_CODE_EXCEPTION_MAPPING` dictionary and accordingly raise the error.
     If status_code is 200 then simply return json response.
     """
-    try:
-        response_json = response.json()
-    except Exception: # pylint: disable=broad-except
-        response_json = {}
     if response.status_code not in [200, 404]:
+        # Only error bodies are parsed here, the callers parse the pages of successful responses
+        try:
+            response_json = response.json()
+        except Exception: # pylint: disable=broad-except
+            response_json = {}
         if response_json.get('error'):
             message = "HTTP-code: {}, Message: {}".format(response.status_code, response_json.get('error'))
         else:
@@ -155,18 +292,20 @@ def get_config():
                     (ConnectionError, Timeout,OSError),#As ConnectionError error and timeout error does not have attribute status_code,
                     max_tries=5, # here we added another backoff expression.
                     factor=2)
-def call_api(url, request_timeout, params, headers):
+def call_api(url, request_timeout, params, headers, session=None):
     config = get_config()
     if config.get("marketplace_name") and config.get("marketplace_organization") and config.get("marketplace_app_id"):
         headers["X-Zendesk-Marketplace-Name"] = config.get("marketplace_name")
         headers["X-Zendesk-Marketplace-Organization-Id"] = config.get("marketplace_organization")
         headers["X-Zendesk-Marketplace-App-Id"] = config.get("marketplace_app_id")
         
-    response = requests.get(url, params=params, headers=headers, timeout=request_timeout) # Pass request timeout
+    # Reuse the keep-alive connections of the tap's Session when one is passed
+    get = session.get if session else requests.get
+    response = get(url, params=params, headers=headers, timeout=request_timeout) # Pass request timeout
     raise_for_error(response)
     return response
 
-def get_cursor_based(url, access_token, request_timeout, cursor=None, **kwargs):
+def get_cursor_based(url, access_token, request_timeout, cursor=None, session=None, **kwargs):
     headers = {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
@@ -181,24 +320,44 @@ def get_cursor_based(url, access_token, request_timeout, cursor=None, **kwargs):
 
     if cursor:
         params['page[after]'] = cursor
-    response = call_api(url, request_timeout, params=params, headers=headers)
+    response = call_api(url, request_timeout, params=params, headers=headers, session=session)
     response_json = response.json()
 
     yield response_json
 
-    has_more = response_json['meta']['has_more']
+    # A 404 is let through by `raise_for_error` and its error body has no `meta`, it is the only page
+    has_more = response_json.get('meta', {}).get('has_more')
 
     while has_more:
         cursor = response_json['meta']['after_cursor']
         params['page[after]'] = cursor
 
-        response = call_api(url, request_timeout, params=params, headers=headers)
+        response = call_api(url, request_timeout, params=params, headers=headers, session=session)
         response_json = response.json()
 
         yield response_json
-        has_more = response_json['meta']['has_more']
+        has_more = response_json.get('meta', {}).get('has_more')
 
-def get_offset_based(url, access_token, request_timeout, **kwargs):
+def get_cursor_based_etag(url, access_token, request_timeout, etag=None, session=None):
+    """ Send a HEAD request for the first page of a cursor based endpoint and return its ETag.
+    The known `etag` is returned when Zendesk answers 304 Not Modified, and None when
+    the response carries no ETag, so that callers only ever skip on an exact match. """
+    headers = {
+        'Accept': 'application/json',
+        'Authorization': 'Bearer {}'.format(access_token),
+    }
+    if etag:
+        headers['If-None-Match'] = etag
+
+    head = session.head if session else requests.head
+    response = head(url, params={'page[size]': 100}, headers=headers, timeout=request_timeout)
+    if response.status_code == 304:
+        return etag
+    if response.status_code != 200:
+        return None
+    return response.headers.get('ETag')
+
+def get_offset_based(url, access_token, request_timeout, session=None, **kwargs):
     headers = {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
@@ -211,7 +370,7 @@ def get_offset_based(url, access_token, request_timeout, **kwargs):
         **kwargs.get('params', {})
     }
 
-    response = call_api(url, request_timeout, params=params, headers=headers)
+    response = call_api(url, request_timeout, params=params, headers=headers, session=session)
     response_json = response.json()
 
     yield response_json
@@ -219,13 +378,13 @@ def get_offset_based(url, access_token, request_timeout, **kwargs):
     next_url = response_json.get('next_page')
 
     while next_url:
-        response = call_api(next_url, request_timeout, params=None, headers=headers)
+        response = call_api(next_url, request_timeout, params=None, headers=headers, session=session)
         response_json = response.json()
 
         yield response_json
         next_url = response_json.get('next_page')
 
-def get_incremental_export(url, access_token, request_timeout, start_time):
+def get_incremental_export(url, access_token, request_timeout, start_time, session=None):
     headers = {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
@@ -236,7 +395,7 @@ def get_incremental_export(url, access_token, request_timeout, start_time):
     if not isinstance(start_time, int):
         params = {'start_time': start_time.timestamp()}
 
-    response = call_api(url, request_timeout, params=params, headers=headers)
+    response = call_api(url, request_timeout, params=params, headers=headers, session=session)
     response_json = response.json()
 
     yield response_json
@@ -252,7 +411,7 @@ def get_incremental_export(url, access_token, request_timeout, start_time):
         # response.raise_for_status()
         # Because it doing the same as call_api. So, now error handling will work properly with backoff
         # as earlier backoff was not possible
-        response = call_api(url, request_timeout, params=params, headers=headers)
+        response = call_api(url, request_timeout, params=params, headers=headers, session=session)
 
         response_json = response.json()
 
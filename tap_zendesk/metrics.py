@@ -3,6 +3,7 @@ from statistics import mean
 from collections import defaultdict
 from datetime import datetime
 import singer
+from singer.metrics import Metric, Point, Status, Tag
 
 # Defines the window (in seconds) over which we will collect raw metrics.
 # After this much time has elapsed we'll capture a compressed datapoint
@@ -97,3 +98,9 @@ def capture(metric):
 def log_aggregate_rates():
     """Forces a log of the aggregate rates for the internal datastructures"""
     _aggregate_rates(capture_rate, metrics_data)
+
+def record_http(duration, status=Status.succeeded):
+    """Logs the duration of an HTTP request as singer's http_request_duration
+    timer metric, the same datapoint `singer.metrics.http_request_timer` logs"""
+    if LOGGER.isEnabledFor(logging.INFO):
+        singer.metrics.log(LOGGER, Point('timer', Metric.http_request_duration, duration, {Tag.status: status}))
@@ -1,18 +1,27 @@
 import os
+import collections
 import json
 import datetime
+import functools
+import itertools
+import re
 import time
+import weakref
 import pytz
 import zenpy
 import copy
 import singer
-from singer import metadata
 from singer import utils
 from singer.metrics import Point
 from tap_zendesk import metrics as zendesk_metrics
 from tap_zendesk import http
 from dateutil.parser import isoparse
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 LOGGER = singer.get_logger()
 KEY_PROPERTIES = ['id']
@@ -36,10 +45,71 @@ CUSTOM_TYPES = {
 }
 
 DEFAULT_SEARCH_WINDOW_SIZE = (60 * 60 * 24) * 30 # defined in seconds, default to a month (30 days)
+MAX_BATCH_SIZE = 100
+# Number of tickets whose sub-stream records are fetched ahead of the ticket being synced
+DEFAULT_SUB_STREAM_CONCURRENCY = 8
+
+# Zendesk's timestamps, and the bookmarks written from them, e.g. 2021-01-01T00:00:00Z or 2021-01-01T00:00:00.000000Z
+ISO_8601_UTC_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?Z$')
+
+@functools.lru_cache(maxsize=4096)
+def _parse_iso(value):
+    """ Parse a timestamp like `utils.strptime_with_tz`. The UTC timestamps Zendesk returns are
+    matched with a regex instead of going through dateutil, other formats fall back to it. """
+    match = ISO_8601_UTC_RE.match(value)
+    if not match:
+        return utils.strptime_with_tz(value)
+    year, month, day, hour, minute, second, fraction = match.groups()
+    return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                             int(fraction.ljust(6, '0')) if fraction else 0, tzinfo=pytz.UTC)
+
+def _fast_json_loads(data):
+    """ Parse JSON with orjson if it is installed, it is several times faster than json. """
+    return orjson.loads(data) if orjson else json.loads(data)
+
+@functools.lru_cache(maxsize=None)
+def _load_schema_file(path):
+    """ Parse a schema file once per process. Callers must not mutate the result. """
+    with open(path, 'rb') as f:
+        return _fast_json_loads(f.read())
+
+def format_epoch(timestamp):
+    """ Format an epoch timestamp in seconds the way `utils.strftime` formats the same UTC datetime. """
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000000Z', time.gmtime(int(timestamp)))
 
 def get_abs_path(path):
     return os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
 
+def get_sub_stream_concurrency(config):
+    # If value is 0, "0", "" or not passed then the default is used.
+    sub_stream_concurrency = config.get('sub_stream_concurrency')
+    if sub_stream_concurrency and int(sub_stream_concurrency) > 0:
+        return int(sub_stream_concurrency)
+    return DEFAULT_SUB_STREAM_CONCURRENCY
+
+def batched(iterable, size):
+    """ Yield lists of up to `size` consecutive items of the iterable. """
+    iterator = iter(iterable)
+    batch = list(itertools.islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(iterator, size))
+
+def prefetched(iterable, executor):
+    """ Yield the items of the iterable, getting the next item on the executor while the current one is used. """
+    iterator = iter(iterable)
+    if executor is None:
+        yield from iterator
+        return
+    # Only one item is fetched ahead, so at most one extra item is held in memory
+    end = object()
+    future = executor.submit(next, iterator, end)
+    item = future.result()
+    while item is not end:
+        future = executor.submit(next, iterator, end)
+        yield item
+        item = future.result()
+
 def process_custom_field(field):
     """ Take a custom field description and return a schema for it. """
     zendesk_type = field.type
@@ -69,10 +139,17 @@ class Stream():
     stream = None
     endpoint = None
     request_timeout = None
+    # Custom field schemas by stream name, for each Zendesk client
+    custom_fields_by_client = weakref.WeakKeyDictionary()
 
     def __init__(self, client=None, config=None):
         self.client = client
         self.config = config
+        self._bookmark = None
+        # The pooled Session of the tap, reused for every page fetched by the stream
+        self._session = self.config.get('_session')
+        # Built once per stream, the module level HEADERS are shared by streams synced in other threads
+        self._headers = {**HEADERS, 'Authorization': 'Bearer {}'.format(self.config.get('access_token'))}
         # Set and pass request timeout to config param `request_timeout` value.
         config_request_timeout = self.config.get('request_timeout')
         if config_request_timeout and float(config_request_timeout):
@@ -81,40 +158,56 @@ class Stream():
             self.request_timeout = REQUEST_TIMEOUT # If value is 0,"0","" or not passed then it set default to 300 seconds.
 
     def get_bookmark(self, state):
-        return utils.strptime_with_tz(singer.get_bookmark(state, self.name, self.replication_key))
+        return _parse_iso(singer.get_bookmark(state, self.name, self.replication_key))
 
     def update_bookmark(self, state, value):
-        current_bookmark = self.get_bookmark(state)
-        if value and utils.strptime_with_tz(value) > current_bookmark:
-            singer.write_bookmark(state, self.name, self.replication_key, value)
+        # The bookmark only moves forward from here, keep it parsed rather than parsing it for every record
+        if self._bookmark is None:
+            self._bookmark = self.get_bookmark(state)
+        if value:
+            value_dt = _parse_iso(value)
+            if value_dt > self._bookmark:
+                self._bookmark = value_dt
+                singer.write_bookmark(state, self.name, self.replication_key, value)
 
 
     def load_schema(self):
         schema_file = "schemas/{}.json".format(self.name)
-        with open(get_abs_path(schema_file)) as f:
-            schema = json.load(f)
+        # Copied as `_add_custom_fields` fills in the custom fields of the schema in place
+        schema = copy.deepcopy(_load_schema_file(get_abs_path(schema_file)))
         return self._add_custom_fields(schema)
 
     def _add_custom_fields(self, schema): # pylint: disable=no-self-use
         return schema
 
+    def get_custom_fields(self, load_custom_fields):
+        '''
+        Return the schemas of the stream's custom fields, only listing them with `load_custom_fields` the first
+        time for each client, as the schema is loaded for discovery and again for the metadata.
+        '''
+        custom_fields_by_stream = Stream.custom_fields_by_client.setdefault(self.client, {})
+        if self.name not in custom_fields_by_stream:
+            custom_fields_by_stream[self.name] = {field.key: process_custom_field(field)
+                                                  for field in load_custom_fields()}
+        # Copied as the caller adds it to a schema which may be changed later on
+        return copy.deepcopy(custom_fields_by_stream[self.name])
+
     def load_metadata(self):
         schema = self.load_schema()
-        mdata = metadata.new()
-
-        mdata = metadata.write(mdata, (), 'table-key-properties', self.key_properties)
-        mdata = metadata.write(mdata, (), 'forced-replication-method', self.replication_method)
-
+        # Built in the shape `metadata.to_list` returns, without writing each entry through `metadata.write`
+        root_metadata = {
+            'table-key-properties': self.key_properties,
+            'forced-replication-method': self.replication_method,
+        }
         if self.replication_key:
-            mdata = metadata.write(mdata, (), 'valid-replication-keys', [self.replication_key])
-
-        for field_name in schema['properties'].keys():
-            if field_name in self.key_properties or field_name == self.replication_key:
-                mdata = metadata.write(mdata, ('properties', field_name), 'inclusion', 'automatic')
-            else:
-                mdata = metadata.write(mdata, ('properties', field_name), 'inclusion', 'available')
+            root_metadata['valid-replication-keys'] = [self.replication_key]
 
-        return metadata.to_list(mdata)
+        automatic_fields = {*self.key_properties, self.replication_key}
+        mdata = [{'breadcrumb': (), 'metadata': root_metadata}]
+        mdata.extend({'breadcrumb': ('properties', field_name),
+                      'metadata': {'inclusion': 'automatic' if field_name in automatic_fields else 'available'}}
+                     for field_name in schema['properties'])
+        return mdata
 
     def is_selected(self):
         return self.stream is not None
@@ -124,13 +217,17 @@ class Stream():
         Check whether the permission was given to access stream resources or not.
         '''
         url = self.endpoint.format(self.config['subdomain'])
-        HEADERS['Authorization'] = 'Bearer {}'.format(self.config["access_token"])
 
-        http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=HEADERS)
+        http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=self._headers,
+                      session=self._session)
 
 class CursorBasedStream(Stream):
     item_key = None
     endpoint = None
+    # Whether the ETag of the first page tells if the stream changed, see `get_etag`
+    etag_checkable = True
+    # Whether the first page retrieved by `get_objects` had a next page, None until it is retrieved
+    has_more_pages = None
 
     def get_objects(self, **kwargs):
         '''
@@ -138,9 +235,34 @@ class CursorBasedStream(Stream):
         '''
         url = self.endpoint.format(self.config['subdomain'])
         # Pass `request_timeout` parameter
-        for page in http.get_cursor_based(url, self.config['access_token'], self.request_timeout, **kwargs):
+        pages = http.get_cursor_based(url, self.config['access_token'], self.request_timeout,
+                                      session=self._session, **kwargs)
+        for index, page in enumerate(pages):
+            if index == 0:
+                self.has_more_pages = bool(page.get('meta', {}).get('has_more'))
             yield from page[self.item_key]
 
+    def get_ticket_pages(self, ticket_id):
+        '''
+        Page through the endpoint of a single ticket. Cursor pagination is used when `use_cursor_pagination`
+        is set, as Zendesk throttles offset pagination for deep result sets.
+        '''
+        url = self.endpoint.format(self.config['subdomain'], ticket_id)
+        # Pass `request_timeout` parameter
+        if self.config.get('use_cursor_pagination'):
+            return http.get_cursor_based(url, self.config['access_token'], self.request_timeout,
+                                         session=self._session)
+        return http.get_offset_based(url, self.config['access_token'], self.request_timeout,
+                                     session=self._session)
+
+    def get_etag(self, etag=None):
+        '''
+        Return the ETag of the first page, `etag` itself if the page has not changed since.
+        '''
+        url = self.endpoint.format(self.config['subdomain'])
+        return http.get_cursor_based_etag(url, self.config['access_token'], self.request_timeout, etag,
+                                          session=self._session)
+
 class CursorBasedExportStream(Stream):
     endpoint = None
     item_key = None
@@ -151,7 +273,8 @@ class CursorBasedExportStream(Stream):
         '''
         url = self.endpoint.format(self.config['subdomain'])
         # Pass `request_timeout` parameter
-        for page in http.get_incremental_export(url, self.config['access_token'], self.request_timeout, start_time):
+        for page in http.get_incremental_export(url, self.config['access_token'], self.request_timeout, start_time,
+                                                session=self._session):
             if "error" in page and self.item_key not in page:
                 raise Exception("Error: "+page.get("error",{}).get("message","Error found in the account."))
             yield from page[self.item_key]
@@ -165,12 +288,13 @@ def raise_or_log_zenpy_apiexception(schema, stream, e):
     if not isinstance(e, zenpy.lib.exception.APIException):
         raise ValueError("Called with a bad exception type") from e
 
+    body = _fast_json_loads(e.args[0])
     #If read permission is not available in OAuth access_token, then it returns the below error.
-    if json.loads(e.args[0]).get('description') == "You are missing the following required scopes: read":
+    if body.get('description') == "You are missing the following required scopes: read":
         LOGGER.warning("The account credentials supplied do not have access to `%s` custom fields.",
                        stream)
         return schema
-    error = json.loads(e.args[0]).get('error')
+    error = body.get('error')
     # check if the error is of type dictionary and the message retrieved from the dictionary
     # is the expected message. If so, only then print the logger message and return the schema
     if isinstance(error, dict) and error.get('message', None) == "You do not have access to this page. Please contact the account owner of this help desk for further help.":
@@ -193,22 +317,22 @@ class Organizations(Stream):
         # NB: Zenpy doesn't have a public endpoint for this at time of writing
         #     Calling into underlying query method to grab all fields
         try:
-            field_gen = self.client.organizations._query_zendesk(endpoint.organization_fields, # pylint: disable=protected-access
-                                                                 'organization_field')
+            custom_fields = self.get_custom_fields(
+                lambda: self.client.organizations._query_zendesk(endpoint.organization_fields, # pylint: disable=protected-access
+                                                                 'organization_field'))
         except zenpy.lib.exception.APIException as e:
             return raise_or_log_zenpy_apiexception(schema, self.name, e)
-        schema['properties']['organization_fields']['properties'] = {}
-        for field in field_gen:
-            schema['properties']['organization_fields']['properties'][field.key] = process_custom_field(field)
+        schema['properties']['organization_fields']['properties'] = custom_fields
 
         return schema
 
     def sync(self, state):
+        stream = self.stream
         bookmark = self.get_bookmark(state)
         organizations = self.client.organizations.incremental(start_time=bookmark)
         for organization in organizations:
             self.update_bookmark(state, organization.updated_at)
-            yield (self.stream, organization)
+            yield (stream, organization)
 
     def check_access(self):
         '''
@@ -228,23 +352,22 @@ class Users(CursorBasedExportStream):
 
     def _add_custom_fields(self, schema):
         try:
-            field_gen = self.client.user_fields()
+            custom_fields = self.get_custom_fields(self.client.user_fields)
         except zenpy.lib.exception.APIException as e:
             return raise_or_log_zenpy_apiexception(schema, self.name, e)
-        schema['properties']['user_fields']['properties'] = {}
-        for field in field_gen:
-            schema['properties']['user_fields']['properties'][field.key] = process_custom_field(field)
+        schema['properties']['user_fields']['properties'] = custom_fields
 
         return schema
 
     def sync(self, state):
+        stream = self.stream
         bookmark = self.get_bookmark(state)
         epoch_bookmark = int(bookmark.timestamp())
         users = self.get_objects(epoch_bookmark)
 
         for user in users:
             self.update_bookmark(state, user["updated_at"])
-            yield (self.stream, user)
+            yield (stream, user)
 
         #singer.write_state(state)
 
@@ -266,8 +389,15 @@ class Tickets(CursorBasedExportStream):
     item_key = "tickets"
     endpoint = "https://{}.zendesk.com/api/v2/incremental/tickets/cursor.json"
 
-    def sync(self, state): #pylint: disable=too-many-statements
+    def get_batch_size(self):
+        # Zendesk's show_many endpoint accepts at most 100 ids
+        batch_size = self.config.get('batch_size')
+        if batch_size and int(batch_size) > 0:
+            return min(int(batch_size), MAX_BATCH_SIZE)
+        return MAX_BATCH_SIZE
 
+    def sync(self, state): #pylint: disable=too-many-statements
+        stream = self.stream
         bookmark = self.get_bookmark(state)
 
         tickets = self.get_objects(bookmark)
@@ -284,23 +414,27 @@ class Tickets(CursorBasedExportStream):
                                                  tags={'endpoint':sub_stream.stream.tap_stream_id}))
                 sub_stream.count = 0
 
-        if audits_stream.is_selected():
-            LOGGER.info("Syncing ticket_audits per ticket...")
+        def fetch_sub_stream_objects(sub_stream, ticket_id):
+            # Start fetching the sub-stream records of the ticket in the background,
+            # their endpoints are independent of each other so the requests overlap.
+            if executor is None or not sub_stream.is_selected():
+                return None
+            return executor.submit(list, sub_stream.get_objects(ticket_id))
 
-        for ticket in tickets:
-            zendesk_metrics.capture('ticket')
+        def get_fetched_objects(future):
+            # Raises the error of the request, e.g. ZendeskNotFound, in the syncing thread
+            return future.result() if future else None
 
-            generated_timestamp_dt = datetime.datetime.utcfromtimestamp(ticket.get('generated_timestamp')).replace(tzinfo=pytz.UTC)
-
-            self.update_bookmark(state, utils.strftime(generated_timestamp_dt))
+        def sync_ticket(ticket, audits_future, ticket_metric, comments_future):
+            self.update_bookmark(state, format_epoch(ticket.get('generated_timestamp')))
 
             ticket.pop('fields') # NB: Fields is a duplicate of custom_fields, remove before emitting
             # yielding stream name with record in a tuple as it is used for obtaining only the parent records while sync
-            yield (self.stream, ticket)
+            yield (stream, ticket)
 
             if audits_stream.is_selected():
                 try:
-                    for audit in audits_stream.sync(ticket["id"]):
+                    for audit in audits_stream.sync(ticket["id"], get_fetched_objects(audits_future)):
                         yield audit
                 except http.ZendeskNotFound:
                     # Skip stream if ticket_audit does not found for particular ticekt_id. Earlier it throwing HTTPError
@@ -309,12 +443,11 @@ class Tickets(CursorBasedExportStream):
                     LOGGER.warning(message)
 
             if metrics_stream.is_selected():
-                try:
-                    for metric in metrics_stream.sync(ticket["id"]):
+                if ticket_metric:
+                    for metric in metrics_stream.sync(ticket["id"], [ticket_metric]):
                         yield metric
-                except http.ZendeskNotFound:
-                    # Skip stream if ticket_metric does not found for particular ticekt_id. Earlier it throwing HTTPError
-                    # but now as error handling updated, it throws ZendeskNotFound.
+                else:
+                    # Skip stream if ticket_metric does not found for particular ticekt_id, e.g. for deleted tickets
                     message = "Unable to retrieve metrics for ticket (ID: {}), record not found".format(ticket['id'])
                     LOGGER.warning(message)
 
@@ -322,7 +455,7 @@ class Tickets(CursorBasedExportStream):
                 try:
                     # add ticket_id to ticket_comment so the comment can
                     # be linked back to it's corresponding ticket
-                    for comment in comments_stream.sync(ticket["id"], state):
+                    for comment in comments_stream.sync(ticket["id"], state, get_fetched_objects(comments_future)):
                         yield comment
                 except http.ZendeskNotFound:
                     # Skip stream if ticket_comment does not found for particular ticekt_id. Earlier it throwing HTTPError
@@ -330,7 +463,37 @@ class Tickets(CursorBasedExportStream):
                     message = "Unable to retrieve comments for ticket (ID: {}), record not found".format(ticket['id'])
                     LOGGER.warning(message)
 
-            # singer.write_state(state)
+        executor = self.config.get('_executor')
+        # Tickets whose sub-stream records are being fetched. Once the window is full the oldest
+        # ticket is synced, so the records are still yielded in ticket order.
+        in_flight = collections.deque()
+        look_ahead = get_sub_stream_concurrency(self.config)
+
+        if audits_stream.is_selected():
+            LOGGER.info("Syncing ticket_audits per ticket...")
+
+        def get_ticket_batches():
+            for ticket_batch in batched(tickets, self.get_batch_size()):
+                # The metrics of the whole batch of tickets are sideloaded by a single request
+                metrics_by_ticket = {}
+                if metrics_stream.is_selected():
+                    metrics_by_ticket = metrics_stream.get_objects_by_ticket([ticket["id"] for ticket in ticket_batch])
+                yield ticket_batch, metrics_by_ticket
+
+        # The next batch of tickets and its metrics are requested while the current batch is synced
+        for ticket_batch, metrics_by_ticket in prefetched(get_ticket_batches(), executor):
+            for ticket in ticket_batch:
+                zendesk_metrics.capture('ticket')
+                in_flight.append((ticket,
+                                  fetch_sub_stream_objects(audits_stream, ticket["id"]),
+                                  metrics_by_ticket.get(ticket["id"]),
+                                  fetch_sub_stream_objects(comments_stream, ticket["id"])))
+                if len(in_flight) >= look_ahead:
+                    yield from sync_ticket(*in_flight.popleft())
+
+                # singer.write_state(state)
+        while in_flight:
+            yield from sync_ticket(*in_flight.popleft())
         emit_sub_stream_metrics(audits_stream)
         emit_sub_stream_metrics(metrics_stream)
         emit_sub_stream_metrics(comments_stream)
@@ -343,31 +506,33 @@ class Tickets(CursorBasedExportStream):
         url = self.endpoint.format(self.config['subdomain'])
         # Convert start_date parameter to timestamp to pass with request param
         start_time = datetime.datetime.strptime(self.config['start_date'], START_DATE_FORMAT).timestamp()
-        HEADERS['Authorization'] = 'Bearer {}'.format(self.config["access_token"])
 
-        http.call_api(url, self.request_timeout, params={'start_time': start_time, 'per_page': 1}, headers=HEADERS)
+        http.call_api(url, self.request_timeout, params={'start_time': start_time, 'per_page': 1}, headers=self._headers,
+                      session=self._session)
 
 
-class TicketAudits(Stream):
+class TicketAudits(CursorBasedStream):
     name = "ticket_audits"
     replication_method = "INCREMENTAL"
     count = 0
     endpoint='https://{}.zendesk.com/api/v2/tickets/{}/audits.json'
     item_key='audits'
+    etag_checkable = False
 
-    def get_objects(self, ticket_id):
-        url = self.endpoint.format(self.config['subdomain'], ticket_id)
-        # Pass `request_timeout` parameter
-        pages = http.get_offset_based(url, self.config['access_token'], self.request_timeout)
+    def get_objects(self, ticket_id): # pylint: disable=arguments-differ
+        pages = self.get_ticket_pages(ticket_id)
         for page in pages:
             yield from page.get(self.item_key, [])
 
-    def sync(self, ticket_id):
-        ticket_audits = self.get_objects(ticket_id)
+    def sync(self, ticket_id, ticket_audits=None):
+        stream = self.stream
+        if ticket_audits is None:
+            # Not prefetched, e.g. when the tickets are synced without a sub-stream executor
+            ticket_audits = self.get_objects(ticket_id)
         for ticket_audit in ticket_audits:
             zendesk_metrics.capture('ticket_audit')
             self.count += 1
-            yield (self.stream, ticket_audit)
+            yield (stream, ticket_audit)
 
     def check_access(self):
         '''
@@ -375,9 +540,9 @@ class TicketAudits(Stream):
         '''
 
         url = self.endpoint.format(self.config['subdomain'], '1')
-        HEADERS['Authorization'] = 'Bearer {}'.format(self.config["access_token"])
         try:
-            http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=HEADERS)
+            http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=self._headers,
+                          session=self._session)
         except http.ZendeskNotFound:
             #Skip 404 ZendeskNotFound error as goal is just to check whether TicketComments have read permission or not
             pass
@@ -388,91 +553,126 @@ class TicketMetrics(CursorBasedStream):
     count = 0
     endpoint = 'https://{}.zendesk.com/api/v2/tickets/{}/metrics'
     item_key = 'ticket_metric'
+    etag_checkable = False
+    show_many_endpoint = 'https://{}.zendesk.com/api/v2/tickets/show_many.json'
 
-    def sync(self, ticket_id):
+    def get_objects(self, ticket_id): # pylint: disable=arguments-differ
         # Only 1 ticket metric per ticket
         url = self.endpoint.format(self.config['subdomain'], ticket_id)
         # Pass `request_timeout`
-        pages = http.get_offset_based(url, self.config['access_token'], self.request_timeout)
+        pages = http.get_offset_based(url, self.config['access_token'], self.request_timeout,
+                                      session=self._session)
         for page in pages:
+            yield page[self.item_key]
+
+    def get_objects_by_ticket(self, ticket_ids):
+        '''
+        Retrieve the metrics of up to 100 tickets with one request, sideloading them from the show_many endpoint
+        '''
+        url = self.show_many_endpoint.format(self.config['subdomain'])
+        params = {'ids': ','.join(str(ticket_id) for ticket_id in ticket_ids), 'include': 'metric_sets'}
+        response = http.call_api(url, self.request_timeout, params=params, headers=self._headers,
+                                 session=self._session)
+        return {metric_set['ticket_id']: metric_set for metric_set in response.json().get('metric_sets', [])}
+
+    def sync(self, ticket_id, ticket_metrics=None):
+        stream = self.stream
+        if ticket_metrics is None:
+            # Not sideloaded by Tickets.sync, when the metrics of a single ticket are synced on their own
+            ticket_metrics = self.get_objects(ticket_id)
+        for ticket_metric in ticket_metrics:
             zendesk_metrics.capture('ticket_metric')
             self.count += 1
-            yield (self.stream, page[self.item_key])
+            yield (stream, ticket_metric)
 
     def check_access(self):
         '''
         Check whether the permission was given to access stream resources or not.
         '''
         url = self.endpoint.format(self.config['subdomain'], '1')
-        HEADERS['Authorization'] = 'Bearer {}'.format(self.config["access_token"])
         try:
-            http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=HEADERS)
+            http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=self._headers,
+                          session=self._session)
         except http.ZendeskNotFound:
             #Skip 404 ZendeskNotFound error as goal is just to check whether TicketComments have read permission or not
             pass
 
-class TicketComments(Stream):
+class TicketComments(CursorBasedStream):
     name = "ticket_comments"
     replication_key = "created_at"
     replication_method = "INCREMENTAL"
     count = 0
-    starting_state = None
-    starting_bookmark = None
+    starting_bookmarks = None
+    default_bookmark = None
+    current_bookmarks = None
     endpoint = "https://{}.zendesk.com/api/v2/tickets/{}/comments.json"
     item_key='comments'
+    etag_checkable = False
 
-    def get_objects(self, ticket_id):
-        url = self.endpoint.format(self.config['subdomain'], ticket_id)
-        # Pass `request_timeout` parameter
-        pages = http.get_offset_based(url, self.config['access_token'], self.request_timeout)
+    def get_objects(self, ticket_id): # pylint: disable=arguments-differ
+        pages = self.get_ticket_pages(ticket_id)
 
         for page in pages:
             items = page.get(self.item_key)
             if items:
                 yield from items
 
-    def sync(self, ticket_id, state):
-        for ticket_comment in self.get_objects(ticket_id):
+    def load_bookmarks(self, state, ticket_id):
+        '''
+        Snapshot the per-ticket bookmarks at the start of the sync, parsed and keyed by the ticket id as a string,
+        which is how the ids are keyed in the state once it has been serialized.
+        '''
+        state = singer.bookmarks.ensure_bookmark_path(state, ['bookmarks', self.name, self.replication_key])
+        # If bookmark is not available for ticket_comments, then check for bookmark for tickets
+        tc_bookmark = state['bookmarks']['ticket_comments'].get(self.replication_key)
+        if not tc_bookmark:
+            state['bookmarks']['ticket_comments'][self.replication_key] = { str(ticket_id): state['bookmarks']['tickets']['generated_timestamp']}
+        # The bookmarks are parsed into new dicts right away, so the state itself doesn't have to be copied
+        starting_bookmark = singer.get_bookmark(state, self.name, self.replication_key)
+        self.starting_bookmarks = {str(tc_ticket_id): _parse_iso(created_at)
+                                   for tc_ticket_id, created_at in starting_bookmark.items()}
+        # Comments of tickets without a bookmark of their own are synced from the tickets bookmark
+        tickets_bookmark = state['bookmarks'].get("tickets").get(Tickets.replication_key)
+        self.default_bookmark = _parse_iso(tickets_bookmark or self.config.get("start_date"))
+        self.current_bookmarks = dict(self.starting_bookmarks)
+
+    def sync(self, ticket_id, state, ticket_comments=None):
+        stream = self.stream
+        if ticket_comments is None:
+            # Not prefetched, e.g. when the tickets are synced without a sub-stream executor
+            ticket_comments = self.get_objects(ticket_id)
+        bookmark_key = str(ticket_id)
+        latest_created_at = None
+        for ticket_comment in ticket_comments:
             ticket_comment['ticket_id'] = ticket_id
-            if not self.starting_state:
-                state = singer.bookmarks.ensure_bookmark_path(state, ['bookmarks', self.name, self.replication_key])
-                # If bookmark is not available for ticket_comments, then check for bookmark for tickets
-                tc_bookmark = state['bookmarks']['ticket_comments'].get(self.replication_key)
-                if not tc_bookmark and len(tc_bookmark) == 0:
-                    state['bookmarks']['ticket_comments'][self.replication_key] = { str(ticket_id): state['bookmarks']['tickets']['generated_timestamp']}
-                self.starting_state = copy.deepcopy(state)
-                self.starting_bookmark = singer.get_bookmark(self.starting_state, self.name, self.replication_key)
-
+            if self.starting_bookmarks is None:
+                self.load_bookmarks(state, ticket_id)
 
             # created_at
             created_at = ticket_comment.get('created_at')
-            current_bookmark = singer.get_bookmark(state, self.name, self.replication_key)
-            if not current_bookmark.get(ticket_id):
-                state['bookmarks'][self.name][self.replication_key][ticket_id] = created_at
-            else:
-                current_bookmark = utils.strptime_with_tz(current_bookmark.get(ticket_id))
-                if created_at and utils.strptime_with_tz(created_at) > current_bookmark:
-                    state['bookmarks'][self.name][self.replication_key][ticket_id] = created_at
-            
-            if self.starting_bookmark.get(str(ticket_id)):
-                ticket_bookmark = utils.strptime_with_tz(self.starting_bookmark.get(str(ticket_id)))
-            elif self.starting_state['bookmarks'].get("tickets").get(Tickets.replication_key):
-                ticket_bookmark = utils.strptime_with_tz(self.starting_state["bookmarks"].get("tickets").get(Tickets.replication_key))
-            else: 
-                ticket_bookmark = utils.strptime_with_tz(self.config.get("start_date"))
-            if utils.strptime_with_tz(created_at) > ticket_bookmark:
-                yield (self.stream, ticket_comment)
+            created_at_dt = _parse_iso(created_at)
+            current_bookmark = self.current_bookmarks.get(bookmark_key)
+            if current_bookmark is None or created_at_dt > current_bookmark:
+                self.current_bookmarks[bookmark_key] = created_at_dt
+                latest_created_at = created_at
+
+            if created_at_dt > self.starting_bookmarks.get(bookmark_key, self.default_bookmark):
+                yield (stream, ticket_comment)
                 zendesk_metrics.capture('ticket_comment')
                 self.count += 1
 
+        # Written once all the comments of the ticket are synced
+        if latest_created_at:
+            state['bookmarks'][self.name][self.replication_key][bookmark_key] = latest_created_at
+
     def check_access(self):
         '''
         Check whether the permission was given to access stream resources or not.
         '''
         url = self.endpoint.format(self.config['subdomain'], '1')
-        HEADERS['Authorization'] = 'Bearer {}'.format(self.config["access_token"])
         try:
-            http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=HEADERS)
+            http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=self._headers,
+                          session=self._session)
         except http.ZendeskNotFound:
             #Skip 404 ZendeskNotFound error as goal is to just check to whether TicketComments have read permission or not
             pass
@@ -483,16 +683,19 @@ class SatisfactionRatings(CursorBasedStream):
     replication_key = "updated_at"
     endpoint = 'https://{}.zendesk.com/api/v2/satisfaction_ratings'
     item_key = 'satisfaction_ratings'
+    # Requested from the bookmark, so the first page differs between runs
+    etag_checkable = False
 
     def sync(self, state):
+        stream = self.stream
         bookmark = self.get_bookmark(state)
         epoch_bookmark = int(bookmark.timestamp())
         params = {'start_time': epoch_bookmark}
         ratings = self.get_objects(params=params)
         for rating in ratings:
-            if utils.strptime_with_tz(rating['updated_at']) >= bookmark:
+            if _parse_iso(rating['updated_at']) >= bookmark:
                 self.update_bookmark(state, rating['updated_at'])
-                yield (self.stream, rating)
+                yield (stream, rating)
 
 
 class Groups(CursorBasedStream):
@@ -503,16 +706,17 @@ class Groups(CursorBasedStream):
     item_key = 'groups'
 
     def sync(self, state):
+        stream = self.stream
         bookmark = self.get_bookmark(state)
 
         groups = self.get_objects()
         for group in groups:
-            if utils.strptime_with_tz(group['updated_at']) >= bookmark:
+            if _parse_iso(group['updated_at']) >= bookmark:
                 # NB: We don't trust that the records come back ordered by
                 # updated_at (we've observed out-of-order records),
                 # so we can't save state until we've seen all records
                 self.update_bookmark(state, group['updated_at'])
-                yield (self.stream, group)
+                yield (stream, group)
 
 class Macros(CursorBasedStream):
     name = "macros"
@@ -522,16 +726,17 @@ class Macros(CursorBasedStream):
     item_key = 'macros'
 
     def sync(self, state):
+        stream = self.stream
         bookmark = self.get_bookmark(state)
 
         macros = self.get_objects()
         for macro in macros:
-            if utils.strptime_with_tz(macro['updated_at']) >= bookmark:
+            if _parse_iso(macro['updated_at']) >= bookmark:
                 # NB: We don't trust that the records come back ordered by
                 # updated_at (we've observed out-of-order records),
                 # so we can't save state until we've seen all records
                 self.update_bookmark(state, macro['updated_at'])
-                yield (self.stream, macro)
+                yield (stream, macro)
 
 class Tags(CursorBasedStream):
     name = "tags"
@@ -541,10 +746,11 @@ class Tags(CursorBasedStream):
     item_key = 'tags'
 
     def sync(self, state): # pylint: disable=unused-argument
+        stream = self.stream
         tags = self.get_objects()
 
         for tag in tags:
-            yield (self.stream, tag)
+            yield (stream, tag)
 
 class TicketFields(CursorBasedStream):
     name = "ticket_fields"
@@ -554,16 +760,17 @@ class TicketFields(CursorBasedStream):
     item_key = 'ticket_fields'
 
     def sync(self, state):
+        stream = self.stream
         bookmark = self.get_bookmark(state)
 
         fields = self.get_objects()
         for field in fields:
-            if utils.strptime_with_tz(field['updated_at']) >= bookmark:
+            if _parse_iso(field['updated_at']) >= bookmark:
                 # NB: We don't trust that the records come back ordered by
                 # updated_at (we've observed out-of-order records),
                 # so we can't save state until we've seen all records
                 self.update_bookmark(state, field['updated_at'])
-                yield (self.stream, field)
+                yield (stream, field)
 
 class TicketForms(Stream):
     name = "ticket_forms"
@@ -571,16 +778,17 @@ class TicketForms(Stream):
     replication_key = "updated_at"
 
     def sync(self, state):
+        stream = self.stream
         bookmark = self.get_bookmark(state)
 
         forms = self.client.ticket_forms()
         for form in forms:
-            if utils.strptime_with_tz(form.updated_at) >= bookmark:
+            if _parse_iso(form.updated_at) >= bookmark:
                 # NB: We don't trust that the records come back ordered by
                 # updated_at (we've observed out-of-order records),
                 # so we can't save state until we've seen all records
                 self.update_bookmark(state, form.updated_at)
-                yield (self.stream, form)
+                yield (stream, form)
 
     def check_access(self):
         '''
@@ -597,23 +805,24 @@ class GroupMemberships(CursorBasedStream):
 
 
     def sync(self, state):
+        stream = self.stream
         bookmark = self.get_bookmark(state)
         memberships = self.get_objects()
 
         for membership in memberships:
             # some group memberships come back without an updated_at
             if membership['updated_at']:
-                if utils.strptime_with_tz(membership['updated_at']) >= bookmark:
+                if _parse_iso(membership['updated_at']) >= bookmark:
                     # NB: We don't trust that the records come back ordered by
                     # updated_at (we've observed out-of-order records),
                     # so we can't save state until we've seen all records
                     self.update_bookmark(state, membership['updated_at'])
-                    yield (self.stream, membership)
+                    yield (stream, membership)
             else:
                 if membership['id']:
                     LOGGER.info('group_membership record with id: ' + str(membership['id']) +
                                 ' does not have an updated_at field so it will be syncd...')
-                    yield (self.stream, membership)
+                    yield (stream, membership)
                 else:
                     LOGGER.info('Received group_membership record with no id or updated_at, skipping...')
 
@@ -622,8 +831,9 @@ class SLAPolicies(Stream):
     replication_method = "FULL_TABLE"
 
     def sync(self, state): # pylint: disable=unused-argument
+        stream = self.stream
         for policy in self.client.sla_policies():
-            yield (self.stream, policy)
+            yield (stream, policy)
 
     def check_access(self):
         '''
@@ -1,4 +1,6 @@
 import json
+import sys
+import threading
 from zenpy.lib.api_objects import BaseObject
 from zenpy.lib.proxy import ProxyList
 
@@ -9,12 +11,22 @@ from singer import Transformer
 
 LOGGER = singer.get_logger()
 
+# Parent streams may be synced from several threads at once, they all share stdout.
+OUTPUT_LOCK = threading.Lock()
+
 def process_record(record):
     """ Serializes Zenpy's internal classes into Python objects via ZendeskEncoder. """
     rec_str = json.dumps(record, cls=ZendeskEncoder)
     rec_dict = json.loads(rec_str)
     return rec_dict
 
+def write_record(stream_name, record):
+    """ Write a RECORD message like `singer.write_record`, but without flushing stdout after it.
+    The messages stay in order, stdout is still flushed with every SCHEMA and STATE message. """
+    message = singer.format_message(singer.RecordMessage(stream=stream_name, record=record))
+    with OUTPUT_LOCK:
+        sys.stdout.write(message + '\n')
+
 def sync_stream(state, start_date, instance):
     stream = instance.stream
 
@@ -27,6 +39,8 @@ def sync_stream(state, start_date, instance):
                               start_date)
 
     parent_stream = stream
+    # Schema dicts and metadata maps of the parent and its sub-streams, built once instead of per record
+    transform_args_by_stream = {}
     with metrics.record_counter(stream.tap_stream_id) as counter, Transformer() as transformer:
         for (stream, record) in instance.sync(state):
             # NB: Only count parent records in the case of sub-streams
@@ -34,10 +48,14 @@ def sync_stream(state, start_date, instance):
                 counter.increment()
 
             rec = process_record(record)
+            transform_args = transform_args_by_stream.get(stream.tap_stream_id)
+            if transform_args is None:
+                transform_args = (stream.schema.to_dict(), metadata.to_map(stream.metadata))
+                transform_args_by_stream[stream.tap_stream_id] = transform_args
             # SCHEMA_GEN: Comment out transform
-            rec = transformer.transform(rec, stream.schema.to_dict(), metadata.to_map(stream.metadata))
+            rec = transformer.transform(rec, *transform_args)
 
-            singer.write_record(stream.tap_stream_id, rec)
+            write_record(stream.tap_stream_id, rec)
             # NB: We will only write state at the end of a stream's sync:
             #  We may find out that there exists a sync that takes too long and can never emit a bookmark
             #  but we don't know if we can guarentee the order of emitted records.
@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import patch
+import singer
+import tap_zendesk
+
+def get_catalog(stream_names):
+    return singer.Catalog.from_dict({"streams": [
+        {
+            "stream": stream_name,
+            "tap_stream_id": stream_name,
+            "schema": {"type": "object", "properties": {}},
+            "metadata": [{"breadcrumb": [], "metadata": {"selected": True, "table-key-properties": ["id"]}}]
+        } for stream_name in stream_names]})
+
+@patch('tap_zendesk.singer.write_state')
+@patch('tap_zendesk.write_schemas')
+@patch('tap_zendesk.sync_stream', return_value=1)
+class TestDoSync(unittest.TestCase):
+    """
+    Test that `do_sync` syncs every selected parent stream, either one after another or concurrently.
+    """
+    stream_names = ["groups", "macros", "tags", "tickets", "ticket_audits"]
+
+    @patch('tap_zendesk.zendesk_metrics.log_aggregate_rates')
+    def test_streams_synced_one_after_another_by_default(self, mock_log_aggregate_rates, mock_sync_stream,
+                                                         mock_write_schemas, mock_write_state):
+        tap_zendesk.do_sync(None, get_catalog(self.stream_names), {}, {"start_date": "2021-01-01T00:00:00Z"})
+
+        synced = [call[0][2].name for call in mock_sync_stream.call_args_list]
+        # ticket_audits is synced by its parent tickets stream
+        self.assertEqual(synced, ["groups", "macros", "tags", "tickets"])
+        mock_write_state.assert_called_once()
+        mock_write_schemas.assert_called_once()
+        # The aggregate rates are logged once for the whole sync, not after every stream
+        mock_log_aggregate_rates.assert_called_once()
+        self.assertIn(singer.SchemaMessage(stream="ticket_audits",
+                                           schema={"type": "object", "properties": {}},
+                                           key_properties=["id"]),
+                      mock_write_schemas.call_args[0][0])
+
+    def test_cursor_pagination_enabled_by_default(self, mock_sync_stream, mock_write_schemas, mock_write_state):
+        config = {"start_date": "2021-01-01T00:00:00Z"}
+        tap_zendesk.do_sync(None, get_catalog(self.stream_names), {}, config)
+        self.assertTrue(config["use_cursor_pagination"])
+
+        config = {"start_date": "2021-01-01T00:00:00Z", "use_cursor_pagination": False}
+        tap_zendesk.do_sync(None, get_catalog(self.stream_names), {}, config)
+        self.assertFalse(config["use_cursor_pagination"])
+
+    def test_streams_synced_concurrently(self, mock_sync_stream, mock_write_schemas, mock_write_state):
+        config = {"start_date": "2021-01-01T00:00:00Z", "max_concurrent_streams": "3"}
+        tap_zendesk.do_sync(None, get_catalog(self.stream_names), {}, config)
+
+        synced = sorted(call[0][2].name for call in mock_sync_stream.call_args_list)
+        self.assertEqual(synced, ["groups", "macros", "tags", "tickets"])
+        mock_write_state.assert_called_once()
+
+    def test_concurrent_sync_raises_stream_error(self, mock_sync_stream, mock_write_schemas, mock_write_state):
+        mock_sync_stream.side_effect = Exception("sync failed")
+        config = {"start_date": "2021-01-01T00:00:00Z", "max_concurrent_streams": 2}
+
+        with self.assertRaises(Exception) as e:
+            tap_zendesk.do_sync(None, get_catalog(self.stream_names), {}, config)
+
+        self.assertEqual(str(e.exception), "sync failed")
+        mock_write_state.assert_not_called()
+
+class TestGetSyncPlan(unittest.TestCase):
+    """
+    Test that the sync plan lists the schemas to write and the parent streams to sync.
+    """
+    def test_sub_streams_follow_their_parent(self):
+        schema_stream_names, parent_stream_names = tap_zendesk.get_sync_plan(
+            ["ticket_comments", "groups", "tickets", "users"], {"groups", "tickets", "ticket_comments"})
+
+        self.assertEqual(schema_stream_names, ["ticket_comments", "groups", "tickets", "ticket_comments"])
+        self.assertEqual(parent_stream_names, ["groups", "tickets"])
+
+class TestValidateDependencies(unittest.TestCase):
+    """
+    Test that sub-streams can only be selected together with their parent stream.
+    """
+    def test_sub_stream_without_parent_raises(self):
+        with self.assertRaises(tap_zendesk.DependencyException) as e:
+            tap_zendesk.validate_dependencies(["groups", "ticket_comments"])
+
+        self.assertEqual(str(e.exception), "Unable to extract ticket_comments data. "
+                                           "To receive ticket_comments data, you also need to select tickets.")
+
+    def test_sub_stream_with_parent_is_valid(self):
+        tap_zendesk.validate_dependencies(["ticket_comments", "ticket_metrics", "tickets"])
+
+@patch('tap_zendesk.sync_stream', return_value=1)
+@patch('tap_zendesk.streams.CursorBasedStream.get_etag', return_value='W/"abc"')
+class TestSkipUnchangedStreams(unittest.TestCase):
+    """
+    Test that single page streams whose ETag is unchanged since the previous run are skipped when enabled.
+    """
+    config = {"start_date": "2021-01-01T00:00:00Z", "skip_unchanged_streams": True}
+
+    def test_unchanged_stream_skipped(self, mock_get_etag, mock_sync_stream):
+        state = {"etags": {"groups": {"etag": 'W/"abc"', "has_more": False}}}
+        self.assertEqual(tap_zendesk.sync_parent_stream(None, state, self.config, "groups"), 0)
+        mock_get_etag.assert_called_once_with('W/"abc"')
+        mock_sync_stream.assert_not_called()
+
+    def test_multi_page_stream_synced_although_first_page_unchanged(self, mock_get_etag, mock_sync_stream):
+        state = {"etags": {"groups": {"etag": 'W/"abc"', "has_more": True}}}
+        self.assertEqual(tap_zendesk.sync_parent_stream(None, state, self.config, "groups"), 1)
+        mock_sync_stream.assert_called_once()
+
+    @patch('tap_zendesk.http.get_cursor_based')
+    def test_pages_of_synced_stream_saved(self, mock_get_cursor_based, mock_get_etag, mock_sync_stream):
+        mock_get_cursor_based.side_effect = lambda *args, **kwargs: iter([
+            {"groups": [{"id": 1}], "meta": {"has_more": True, "after_cursor": "abc"}},
+            {"groups": [{"id": 2}], "meta": {"has_more": False}}])
+        mock_sync_stream.side_effect = lambda state, start_date, instance: len(list(instance.get_objects()))
+        state = {"etags": {"groups": {"etag": 'W/"old"', "has_more": False}}}
+        config = {**self.config, "subdomain": "acme", "access_token": "token"}
+
+        self.assertEqual(tap_zendesk.sync_parent_stream(None, state, config, "groups"), 2)
+        self.assertEqual(state["etags"], {"groups": {"etag": 'W/"abc"', "has_more": True}})
+        # The first page is unchanged on the next run, but the stream had more pages
+        self.assertEqual(tap_zendesk.sync_parent_stream(None, state, config, "groups"), 2)
+
+    def test_incremental_exports_not_checked(self, mock_get_etag, mock_sync_stream):
+        tap_zendesk.sync_parent_stream(None, {}, self.config, "users")
+        tap_zendesk.sync_parent_stream(None, {}, self.config, "satisfaction_ratings")
+        mock_get_etag.assert_not_called()
+        self.assertEqual(mock_sync_stream.call_count, 2)
+
+    def test_not_checked_by_default(self, mock_get_etag, mock_sync_stream):
+        tap_zendesk.sync_parent_stream(None, {}, {"start_date": "2021-01-01T00:00:00Z"}, "groups")
+        mock_get_etag.assert_not_called()
@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import requests
+import tap_zendesk
+from tap_zendesk.cache import ETagCache
+
+URL = "https://acme.zendesk.com/api/v2/groups"
+
+def mocked_response(status_code, content=b"", headers=None):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+class TestETagCache(unittest.TestCase):
+    """
+    Test that sessions with an ETag cache send `If-None-Match` and reuse the cached body on 304.
+    """
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.session = tap_zendesk.MetricsSession()
+        self.session.etag_cache = ETagCache(self.cache_dir)
+
+    def tearDown(self):
+        self.session.etag_cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    @patch('requests.Session.request')
+    def test_not_modified_response_is_served_from_cache(self, mock_request):
+        mock_request.side_effect = [
+            mocked_response(200, b'{"groups": [{"id": 1}]}', {"ETag": 'W/"abc"'}),
+            mocked_response(304, headers={"ETag": 'W/"abc"'}),
+        ]
+
+        first = self.session.get(URL, params={"page[size]": 100})
+        second = self.session.get(URL, params={"page[size]": 100})
+
+        self.assertNotIn("headers", mock_request.call_args_list[0][1])
+        self.assertEqual(mock_request.call_args_list[1][1]["headers"], {"If-None-Match": 'W/"abc"'})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+
+    @patch('requests.Session.request')
+    def test_incremental_exports_are_not_cached(self, mock_request):
+        mock_request.return_value = mocked_response(200, b'{"users": []}', {"ETag": 'W/"abc"'})
+        url = "https://acme.zendesk.com/api/v2/incremental/users/cursor.json"
+
+        self.session.get(url, params={"start_time": 1})
+        self.session.get(url, params={"start_time": 1})
+
+        self.assertNotIn("headers", mock_request.call_args_list[1][1])
+
+    def test_only_first_pages_of_streams_are_cached(self):
+        self.assertEqual(ETagCache.get_key("GET", URL, {"page[size]": 100}), URL + "?page%5Bsize%5D=100")
+        self.assertIsNone(ETagCache.get_key("GET", URL, {"page[size]": 100, "page[after]": "abc"}))
+        self.assertIsNone(ETagCache.get_key("GET", URL + "?page=2"))
+        self.assertIsNone(ETagCache.get_key("GET", "https://acme.zendesk.com/api/v2/tickets/1/comments.json"))
+        self.assertIsNone(ETagCache.get_key("GET", "https://acme.zendesk.com/api/v2/tickets/show_many.json",
+                                            {"ids": "1,2"}))
+
+    def test_oldest_responses_evicted(self):
+        cache = self.session.etag_cache
+        cache.max_entries = 2
+        for index in range(3):
+            cache.store("{}/{}".format(URL, index), mocked_response(200, b'{}', {"ETag": 'W/"{}"'.format(index)}))
+        # Storing a response again makes it the newest one
+        cache.store("{}/1".format(URL), mocked_response(200, b'{}', {"ETag": 'W/"1"'}))
+        cache.store("{}/3".format(URL), mocked_response(200, b'{}', {"ETag": 'W/"3"'}))
+
+        self.assertEqual([cache.get_etag("{}/{}".format(URL, index)) for index in range(4)],
+                         [None, 'W/"1"', None, 'W/"3"'])
+
+    def test_responses_kept_across_runs(self):
+        self.session.etag_cache.store(URL, mocked_response(200, b'{}', {"ETag": 'W/"abc"'}))
+        self.session.etag_cache.close()
+        self.session.etag_cache = ETagCache(self.cache_dir)
+
+        self.assertEqual(self.session.etag_cache.get_etag(URL), 'W/"abc"')
+
+    def test_get_session_adds_cache_only_when_enabled(self):
+        self.assertIsNone(tap_zendesk.get_session({}).etag_cache)
+        with patch('tap_zendesk.ETagCache') as mock_cache:
+            session = tap_zendesk.get_session({"etag_cache": True})
+        self.assertEqual(session.etag_cache, mock_cache.return_value)
@@ -479,3 +479,20 @@ class TestBackoff(unittest.TestCase):
 
         # Verify the request retry 10 times
         self.assertEqual(mock_get.call_count, 10)
+
+
+class TestRaiseForError(unittest.TestCase):
+    """
+    Test that the body of a successful response is left for the caller to parse.
+    """
+
+    @patch("requests.get")
+    def test_successful_page_parsed_once(self, mock_get):
+        response = MagicMock(status_code=200)
+        response.json.return_value = SINGLE_RESPONSE
+        mock_get.return_value = response
+
+        pages = list(http.get_cursor_based(url="some_url", access_token="some_token", request_timeout=300))
+
+        self.assertEqual(pages, [SINGLE_RESPONSE])
+        response.json.assert_called_once()
@@ -0,0 +1,68 @@
+import ssl
+import unittest
+from unittest.mock import patch
+import requests
+from tap_zendesk import get_session, http
+
+@unittest.skipIf(http.httpx is None, "httpx is not installed")
+class TestHTTP2Adapter(unittest.TestCase):
+    """
+    Test that the HTTP/2 adapter turns httpx responses into requests responses.
+    """
+    def get_session(self, handler):
+        session = get_session({"use_http2": True})
+        adapter = session.get_adapter("https://acme.zendesk.com")
+        client = http.httpx.Client(transport=http.httpx.MockTransport(handler))
+        patcher = patch.object(adapter, 'get_client', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return session
+
+    def test_response_is_converted(self):
+        def handler(request):
+            self.assertEqual(request.url.params["page[size]"], "100")
+            self.assertEqual(request.headers["Authorization"], "Bearer token")
+            return http.httpx.Response(200, json={"groups": [{"id": 1}]}, headers={"ETag": 'W/"abc"'})
+
+        response = self.get_session(handler).get("https://acme.zendesk.com/api/v2/groups",
+                                                 params={"page[size]": 100},
+                                                 headers={"Authorization": "Bearer token"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"groups": [{"id": 1}]})
+        self.assertEqual(response.headers["etag"], 'W/"abc"')
+
+    def test_timeout_is_raised_as_requests_timeout(self):
+        def handler(request):
+            raise http.httpx.ReadTimeout("timed out", request=request)
+
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.get_session(handler).get("https://acme.zendesk.com/api/v2/groups", timeout=(5, 30))
+
+    @patch('tap_zendesk.http.httpx.Client')
+    def test_tls_and_proxy_settings_forwarded(self, mock_client):
+        mock_client.return_value.request.return_value = http.httpx.Response(200, json={})
+        session = get_session({"use_http2": True})
+        # Leave the proxies and CA bundle of the environment out of the test
+        session.trust_env = False
+
+        session.get("https://acme.zendesk.com/api/v2/groups", verify=requests.utils.DEFAULT_CA_BUNDLE_PATH,
+                    proxies={"https": "http://proxy.example.com:3128"})
+        session.get("https://acme.zendesk.com/api/v2/groups", verify=False, proxies={})
+
+        (first_call, second_call) = mock_client.call_args_list
+        self.assertEqual(first_call[1]["proxy"], "http://proxy.example.com:3128")
+        self.assertEqual(first_call[1]["verify"].verify_mode, ssl.CERT_REQUIRED)
+        self.assertIsNone(second_call[1]["proxy"])
+        self.assertEqual(second_call[1]["verify"].verify_mode, ssl.CERT_NONE)
+        self.assertFalse(second_call[1]["trust_env"])
+
+    def test_cache_dns_ignored_with_warning(self):
+        with self.assertLogs(level="WARNING") as logs:
+            adapter = get_session({"use_http2": True, "cache_dns": True}).get_adapter("https://acme.zendesk.com")
+
+        self.assertIsInstance(adapter, http.HTTP2Adapter)
+        self.assertIn("`cache_dns` has no effect when `use_http2` is set.", logs.output[0])
+
+    def test_http1_used_by_default(self):
+        self.assertNotIsInstance(get_session({}).get_adapter("https://acme.zendesk.com"), http.HTTP2Adapter)
@@ -1,18 +1,80 @@
+import io
+import json
+import os
+import sys
+import threading
 import unittest
-from tap_zendesk import get_session
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import MagicMock, patch
+import requests
+import singer
+import zenpy
+from tap_zendesk import MetricsSession, get_session, do_discover, buffer_stdout, write_schemas, POOL_MAXSIZE, RETRY
+from tap_zendesk import http
+from tap_zendesk.http import resolve_host
+from tap_zendesk.streams import Users
+from tap_zendesk.sync import write_record
 
 class TestGetSession(unittest.TestCase):
     """
-    Confirm that partner information is added to session headers when
-    present in config.
+    Confirm that a pooled session is always built and that partner information
+    is added to session headers when present in config.
     """
-    def test_no_partner_info_returns_none(self):
+    def test_no_partner_info_returns_session_without_headers(self):
         test_session = get_session({})
-        self.assertEqual(test_session, None)
+        self.assertIsNone(test_session.headers.get("X-Zendesk-Marketplace-Name"))
+        self.assertEqual(POOL_MAXSIZE, test_session.get_adapter("https://acme.zendesk.com")._pool_maxsize)
 
-    def test_incomplete_partner_info_returns_none(self):
+    def test_session_retries_connections_only(self):
+        retry = get_session({}).get_adapter("https://acme.zendesk.com").max_retries
+        self.assertEqual(retry, RETRY)
+        self.assertFalse(retry.is_retry("GET", 429, has_retry_after=True))
+        self.assertFalse(retry.is_retry("GET", 503))
+
+    @patch('time.sleep')
+    def test_unavailable_response_retried_by_call_api_only(self, mock_sleep):
+        attempts = []
+        class UnavailableHandler(BaseHTTPRequestHandler):
+            def do_GET(self): # pylint: disable=invalid-name
+                attempts.append(self.path)
+                self.send_response(503)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args): # pylint: disable=arguments-differ
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), UnavailableHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        with self.assertRaises(http.ZendeskServiceUnavailableError):
+            http.call_api("http://127.0.0.1:{}/api/v2/groups".format(server.server_port), 300,
+                          params={}, headers={}, session=get_session({}))
+
+        self.assertEqual(len(attempts), 10)
+
+    @patch('tap_zendesk.http.socket.getaddrinfo', return_value=[(2, 1, 6, '', ('203.0.113.1', 443))])
+    def test_dns_cached_when_enabled(self, mock_getaddrinfo):
+        resolve_host.cache_clear()
+        self.addCleanup(resolve_host.cache_clear)
+        adapter = get_session({"cache_dns": True}).get_adapter("https://acme.zendesk.com")
+        pool = adapter.get_connection("https://acme.zendesk.com")
+        connections = [pool._new_conn(), pool._new_conn()]
+
+        with patch('urllib3.connection.connection.create_connection') as mock_create_connection:
+            for connection in connections:
+                connection._new_conn()
+
+        self.assertEqual(mock_create_connection.call_args[0][0], ('203.0.113.1', 443))
+        self.assertEqual(connections[0].host, "acme.zendesk.com")
+        mock_getaddrinfo.assert_called_once()
+
+    def test_incomplete_partner_info_returns_session_without_headers(self):
         test_session = get_session({"marketplace_name": "Hithere"})
-        self.assertEqual(test_session, None)
+        self.assertIsNone(test_session.headers.get("X-Zendesk-Marketplace-Name"))
 
     def test_adds_headers_when_all_present_in_config(self):
         test_session = get_session({"marketplace_name": "Hithere",
@@ -21,3 +83,98 @@ class TestGetSession(unittest.TestCase):
         self.assertEqual("Hithere", test_session.headers.get("X-Zendesk-Marketplace-Name"))
         self.assertEqual("1234", test_session.headers.get("X-Zendesk-Marketplace-Organization-Id"))
         self.assertEqual("12345", test_session.headers.get("X-Zendesk-Marketplace-App-Id"))
+
+@patch('tap_zendesk.discover_streams', return_value=[{"stream": "tags", "tap_stream_id": "tags", "schema": {}, "metadata": []}])
+class TestDoDiscover(unittest.TestCase):
+    """
+    Confirm that the catalog is written as the same JSON with or without orjson.
+    """
+    def get_output(self):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        with patch('sys.stdout', stdout):
+            do_discover(None, {})
+        stdout.flush()
+        return json.loads(stdout.buffer.getvalue())
+
+    def test_catalog_written_with_orjson(self, mock_discover_streams):
+        self.assertEqual(self.get_output(), {"streams": mock_discover_streams.return_value})
+
+    @patch('tap_zendesk.orjson', None)
+    def test_catalog_written_without_orjson(self, mock_discover_streams):
+        self.assertEqual(self.get_output(), {"streams": mock_discover_streams.return_value})
+
+@patch('tap_zendesk.streams.Users.check_access')
+@patch('tap_zendesk.discover.STREAMS', {"users": Users})
+class TestDoDiscoverError(unittest.TestCase):
+    """
+    Confirm that nothing is written when listing the custom fields fails.
+    """
+    def test_nothing_written_on_custom_fields_error(self, mock_check_access):
+        client = MagicMock()
+        client.user_fields.side_effect = zenpy.lib.exception.APIException('{"error": "InternalError"}')
+        stdout = io.TextIOWrapper(io.BytesIO())
+
+        with patch('sys.stdout', stdout), self.assertRaises(zenpy.lib.exception.APIException):
+            do_discover(client, {})
+        stdout.flush()
+
+        self.assertEqual(stdout.buffer.getvalue(), b"")
+
+class TestBufferedOutput(unittest.TestCase):
+    """
+    Confirm that records are buffered until the next flush and that a flush reaches the pipe.
+    """
+    def setUp(self):
+        self.read_fd, write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.stdout = open(write_fd, 'w', encoding='utf-8')
+        self.addCleanup(os.close, self.read_fd)
+        self.addCleanup(self.stdout.close)
+
+    def read_messages(self):
+        try:
+            output = os.read(self.read_fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        return [json.loads(line) for line in output.splitlines()]
+
+    def test_records_written_on_flush(self):
+        with patch('sys.stdout', self.stdout):
+            buffer_stdout()
+            write_record("tags", {"name": "a"})
+            write_record("tags", {"name": "b"})
+            self.assertEqual(self.read_messages(), [])
+            sys.stdout.flush()
+            messages = self.read_messages()
+
+        self.assertEqual([message["record"] for message in messages], [{"name": "a"}, {"name": "b"}])
+
+    def test_schemas_and_state_reach_the_pipe(self):
+        with patch('sys.stdout', self.stdout):
+            buffer_stdout()
+            write_schemas([singer.SchemaMessage(stream=name, schema={}, key_properties=["id"])
+                           for name in ["groups", "tags"]])
+            schema_messages = self.read_messages()
+            singer.write_state({"bookmarks": {}})
+            state_messages = self.read_messages()
+
+        self.assertEqual([(message["type"], message["stream"]) for message in schema_messages],
+                         [("SCHEMA", "groups"), ("SCHEMA", "tags")])
+        self.assertEqual([message["type"] for message in state_messages], ["STATE"])
+
+@patch('tap_zendesk.zendesk_metrics.record_http')
+@patch('requests.Session.request')
+class TestMetricsSession(unittest.TestCase):
+    """
+    Confirm that the duration of every request is recorded with its status.
+    """
+    def test_successful_request_recorded(self, mock_request, mock_record_http):
+        mock_request.return_value = requests.models.Response()
+        MetricsSession().get("https://acme.zendesk.com/api/v2/groups")
+        self.assertEqual(mock_record_http.call_args[0][1:], ())
+
+    def test_failed_request_recorded(self, mock_request, mock_record_http):
+        mock_request.side_effect = requests.exceptions.ConnectionError()
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            MetricsSession().get("https://acme.zendesk.com/api/v2/groups")
+        self.assertEqual(mock_record_http.call_args[0][1], "failed")
@@ -0,0 +1,167 @@
+import datetime
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+import pytz
+import zenpy
+from singer import utils
+from tap_zendesk import streams
+from tap_zendesk.streams import _load_schema_file, _parse_iso, format_epoch, prefetched, raise_or_log_zenpy_apiexception, \
+    Groups, Users, HEADERS
+
+class TestParseIso(unittest.TestCase):
+    """
+    Test that timestamps are parsed to the same datetimes as `utils.strptime_with_tz`.
+    """
+    def test_zendesk_timestamps_parsed(self):
+        for value in ["2021-01-01T00:00:00Z", "2021-10-30T12:34:56.000000Z", "2021-10-30T12:34:56.5Z"]:
+            self.assertEqual(_parse_iso(value), utils.strptime_with_tz(value))
+
+    def test_other_formats_fall_back_to_strptime_with_tz(self):
+        for value in ["2021-01-01", "2021-10-30T12:34:56+02:00"]:
+            self.assertEqual(_parse_iso(value), utils.strptime_with_tz(value))
+
+class TestFormatEpoch(unittest.TestCase):
+    """
+    Test that epoch timestamps are formatted like `utils.strftime` formats their UTC datetime.
+    """
+    def test_formatted_like_strftime(self):
+        for timestamp in [0, 1635552000, 1635598496]:
+            expected = utils.strftime(datetime.datetime.utcfromtimestamp(timestamp).replace(tzinfo=pytz.UTC))
+            self.assertEqual(format_epoch(timestamp), expected)
+
+    def test_fraction_of_second_dropped(self):
+        self.assertEqual(format_epoch(1635598496.75), "2021-10-30T12:54:56.000000Z")
+
+class TestPrefetched(unittest.TestCase):
+    """
+    Test that prefetched items are yielded in order and errors are raised where they are consumed.
+    """
+    def test_items_yielded_in_order(self):
+        self.assertEqual(list(prefetched(range(5), None)), [0, 1, 2, 3, 4])
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(list(prefetched(range(5), executor)), [0, 1, 2, 3, 4])
+
+    def test_next_item_fetched_ahead(self):
+        fetched = []
+        def items():
+            for item in range(3):
+                fetched.append(item)
+                yield item
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            iterator = prefetched(items(), executor)
+            self.assertEqual(next(iterator), 0)
+            executor.submit(lambda: None).result()
+            self.assertEqual(fetched, [0, 1])
+
+    def test_error_raised_when_consumed(self):
+        def items():
+            yield 1
+            raise ValueError("page failed")
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            iterator = prefetched(items(), executor)
+            self.assertEqual(next(iterator), 1)
+            with self.assertRaises(ValueError):
+                next(iterator)
+
+class TestUpdateBookmark(unittest.TestCase):
+    """
+    Test that the bookmark only moves forward, also when its format differs from the record's.
+    """
+    def test_bookmark_moves_forward(self):
+        state = {"bookmarks": {"groups": {"updated_at": "2021-10-30T00:00:00.000000Z"}}}
+        stream = Groups(config={})
+
+        for value in ["2021-10-29T00:00:00Z", "2021-10-31T00:00:00Z", None, "2021-10-30T12:00:00Z"]:
+            stream.update_bookmark(state, value)
+
+        self.assertEqual(state["bookmarks"]["groups"]["updated_at"], "2021-10-31T00:00:00Z")
+
+class TestLoadSchema(unittest.TestCase):
+    """
+    Test that schema files are parsed once and every stream gets its own copy.
+    """
+    def test_schema_file_parsed_once(self):
+        _load_schema_file.cache_clear()
+        first = Groups(config={}).load_schema()
+        first["properties"].clear()
+        second = Groups(config={}).load_schema()
+
+        self.assertIn("updated_at", second["properties"])
+        self.assertEqual(_load_schema_file.cache_info().misses, 1)
+
+class TestStreamHeaders(unittest.TestCase):
+    """
+    Test that every stream sends its own Authorization header without changing the shared HEADERS.
+    """
+    @patch('tap_zendesk.http.call_api')
+    def test_check_access_uses_stream_headers(self, mock_call_api):
+        Groups(config={"subdomain": "acme", "access_token": "token"}).check_access()
+
+        self.assertEqual(mock_call_api.call_args[1]["headers"]["Authorization"], "Bearer token")
+        self.assertNotIn("Authorization", HEADERS)
+
+    @patch('tap_zendesk.http.call_api')
+    def test_check_access_reuses_tap_session(self, mock_call_api):
+        session = MagicMock()
+        Groups(config={"subdomain": "acme", "access_token": "token", "_session": session}).check_access()
+
+        self.assertIs(mock_call_api.call_args[1]["session"], session)
+
+class TestCustomFields(unittest.TestCase):
+    """
+    Test that the custom fields are listed once per client and every schema gets its own copy.
+    """
+    def test_custom_fields_listed_once_per_client(self):
+        client = MagicMock()
+        client.user_fields.return_value = [MagicMock(key="plan", type="dropdown",
+                                                     custom_field_options=[MagicMock(value="basic")])]
+
+        first = Users(client, {}).load_schema()
+        first["properties"]["user_fields"]["properties"]["plan"]["enum"].append("changed")
+        second = Users(client, {}).load_schema()
+
+        self.assertEqual(second["properties"]["user_fields"]["properties"]["plan"],
+                         {"type": ["string", "null"], "enum": ["basic"]})
+        client.user_fields.assert_called_once()
+        other_client = MagicMock()
+        other_client.user_fields.return_value = []
+        Users(other_client, {}).load_schema()
+        other_client.user_fields.assert_called_once()
+
+class TestLoadMetadata(unittest.TestCase):
+    """
+    Test that the metadata lists the replication settings and the inclusion of every property.
+    """
+    def test_metadata_of_incremental_stream(self):
+        mdata = Groups(config={}).load_metadata()
+
+        self.assertEqual(mdata[0], {'breadcrumb': (), 'metadata': {'table-key-properties': ['id'],
+                                                                   'forced-replication-method': 'INCREMENTAL',
+                                                                   'valid-replication-keys': ['updated_at']}})
+        inclusion = {entry['breadcrumb'][1]: entry['metadata']['inclusion'] for entry in mdata[1:]}
+        self.assertEqual(inclusion['id'], 'automatic')
+        self.assertEqual(inclusion['updated_at'], 'automatic')
+        self.assertEqual(inclusion['name'], 'available')
+
+class TestRaiseOrLogZenpyApiException(unittest.TestCase):
+    """
+    Test that missing access to custom fields is logged while other API errors are raised.
+    """
+    def get_exception(self, body):
+        return zenpy.lib.exception.APIException(json.dumps(body))
+
+    def test_missing_access_returns_schema(self):
+        for body in [{"description": "You are missing the following required scopes: read"},
+                     {"error": {"message": "You do not have access to this page. Please contact the account owner "
+                                           "of this help desk for further help."}}]:
+            for orjson in [None, streams.orjson]:
+                with patch('tap_zendesk.streams.orjson', orjson):
+                    self.assertEqual(raise_or_log_zenpy_apiexception({}, "users", self.get_exception(body)), {})
+
+    def test_other_errors_raised(self):
+        with self.assertRaises(zenpy.lib.exception.APIException):
+            raise_or_log_zenpy_apiexception({}, "users", self.get_exception({"error": "RecordNotFound"}))
@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from tap_zendesk import streams
+
+COMMENTS_STREAM = MagicMock(tap_stream_id='ticket_comments')
+
+def get_comments(*created_ats):
+    return [{'id': index, 'created_at': created_at} for index, created_at in enumerate(created_ats)]
+
+@patch('tap_zendesk.streams.TicketComments.stream', COMMENTS_STREAM)
+class TestTicketCommentsBookmarks(unittest.TestCase):
+    """
+    Test that ticket comments are synced from the bookmark of their ticket and that it is kept once per ticket.
+    """
+    def test_comments_synced_from_ticket_bookmark(self):
+        state = {'bookmarks': {'tickets': {'generated_timestamp': '2021-10-01T00:00:00.000000Z'},
+                               'ticket_comments': {'created_at': {'1': '2021-10-11T00:00:00Z'}}}}
+        comments_stream = streams.TicketComments(config={'start_date': '2021-01-01T00:00:00Z'})
+
+        ticket_1 = list(comments_stream.sync(1, state, get_comments('2021-10-10T00:00:00Z', '2021-10-12T00:00:00Z')))
+        ticket_2 = list(comments_stream.sync(2, state, get_comments('2021-09-01T00:00:00Z', '2021-10-05T00:00:00Z')))
+
+        # ticket 1 has a bookmark of its own, ticket 2 is synced from the tickets bookmark
+        self.assertEqual([comment['created_at'] for _, comment in ticket_1], ['2021-10-12T00:00:00Z'])
+        self.assertEqual([comment['created_at'] for _, comment in ticket_2], ['2021-10-05T00:00:00Z'])
+        self.assertEqual(state['bookmarks']['ticket_comments']['created_at'],
+                         {'1': '2021-10-12T00:00:00Z', '2': '2021-10-05T00:00:00Z'})
+
+    def test_empty_bookmark_seeded_from_tickets_bookmark(self):
+        state = {'bookmarks': {'tickets': {'generated_timestamp': '2021-10-01T00:00:00.000000Z'},
+                               'ticket_comments': {'created_at': None}}}
+        comments_stream = streams.TicketComments(config={'start_date': '2021-01-01T00:00:00Z'})
+
+        records = list(comments_stream.sync(3, state, get_comments('2021-09-01T00:00:00Z')))
+
+        self.assertEqual(records, [])
+        self.assertEqual(state['bookmarks']['ticket_comments']['created_at'], {'3': '2021-10-01T00:00:00.000000Z'})
@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+import requests
+from tap_zendesk import streams
+
+CONFIG = {'subdomain': 'acme', 'access_token': 'token'}
+
+@patch('tap_zendesk.http.get_offset_based', return_value=iter([{'comments': [{'id': 2}]}]))
+@patch('tap_zendesk.http.get_cursor_based', return_value=iter([{'comments': [{'id': 1}]}]))
+class TestTicketSubStreamPagination(unittest.TestCase):
+    """
+    Test that the ticket sub-streams are paged by cursor only when `use_cursor_pagination` is set.
+    """
+    def test_cursor_pagination(self, mock_cursor_based, mock_offset_based):
+        comments_stream = streams.TicketComments(config={**CONFIG, 'use_cursor_pagination': True})
+
+        self.assertEqual(list(comments_stream.get_objects(1)), [{'id': 1}])
+        mock_cursor_based.assert_called_with('https://acme.zendesk.com/api/v2/tickets/1/comments.json', 'token', 300,
+                                             session=None)
+        mock_offset_based.assert_not_called()
+
+    def test_offset_pagination(self, mock_cursor_based, mock_offset_based):
+        audits_stream = streams.TicketAudits(config=CONFIG)
+        mock_offset_based.return_value = iter([{'audits': [{'id': 3}]}])
+
+        self.assertEqual(list(audits_stream.get_objects(1)), [{'id': 3}])
+        mock_offset_based.assert_called_with('https://acme.zendesk.com/api/v2/tickets/1/audits.json', 'token', 300,
+                                             session=None)
+        mock_cursor_based.assert_not_called()
+
+def mocked_not_found(*args, **kwargs):
+    response = requests.models.Response()
+    response.status_code = 404
+    response._content = b'{"error": "RecordNotFound", "description": "Not found"}'
+    return response
+
+@patch('requests.get', side_effect=mocked_not_found)
+class TestTicketSubStreamNotFound(unittest.TestCase):
+    """
+    Test that the sub-streams of a deleted ticket have no records, whichever pagination is used.
+    """
+    def test_not_found_ticket_has_no_records(self, mock_get):
+        for use_cursor_pagination in [True, False]:
+            config = {**CONFIG, 'use_cursor_pagination': use_cursor_pagination}
+            self.assertEqual(list(streams.TicketAudits(config=config).get_objects(123)), [])
+            self.assertEqual(list(streams.TicketComments(config=config).get_objects(123)), [])
+
+class TestTicketSubStreamSyncWithoutPrefetch(unittest.TestCase):
+    """
+    Test that the sub-streams request their records themselves when none were prefetched for the ticket.
+    """
+    @patch('tap_zendesk.http.get_offset_based', return_value=iter([{'ticket_metric': {'id': 'm1', 'ticket_id': 1}}]))
+    def test_ticket_metrics_requested(self, mock_offset_based):
+        metrics_stream = streams.TicketMetrics(config=CONFIG)
+
+        self.assertEqual(list(metrics_stream.sync(1)), [(None, {'id': 'm1', 'ticket_id': 1})])
+        mock_offset_based.assert_called_with('https://acme.zendesk.com/api/v2/tickets/1/metrics', 'token', 300,
+                                             session=None)
+
+    @patch('tap_zendesk.http.get_cursor_based',
+           return_value=iter([{'comments': [{'id': 1, 'created_at': '2021-10-11T00:00:00Z'}]}]))
+    def test_ticket_comments_requested(self, mock_cursor_based):
+        comments_stream = streams.TicketComments(config={**CONFIG, 'use_cursor_pagination': True})
+        state = {'bookmarks': {'tickets': {'generated_timestamp': '2021-10-01T00:00:00Z'}}}
+
+        self.assertEqual(list(comments_stream.sync(1, state)),
+                         [(None, {'id': 1, 'created_at': '2021-10-11T00:00:00Z', 'ticket_id': 1})])
+        mock_cursor_based.assert_called_once()
+        self.assertEqual(state['bookmarks']['ticket_comments']['created_at'], {'1': '2021-10-11T00:00:00Z'})
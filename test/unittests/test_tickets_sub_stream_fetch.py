@@ -0,0 +1,96 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from tap_zendesk import streams, http
+
+TICKETS_STREAM = MagicMock(tap_stream_id='tickets')
+AUDITS_STREAM = MagicMock(tap_stream_id='ticket_audits')
+METRICS_STREAM = MagicMock(tap_stream_id='ticket_metrics')
+COMMENTS_STREAM = MagicMock(tap_stream_id='ticket_comments')
+
+TICKETS = [{'generated_timestamp': 1634027848, 'fields': [], 'id': 1},
+           {'generated_timestamp': 1634027849, 'fields': [], 'id': 2}]
+
+def mocked_audits(ticket_id):
+    yield {'id': 'a{}'.format(ticket_id), 'ticket_id': ticket_id}
+
+def mocked_comments(ticket_id):
+    if ticket_id == 2:
+        raise http.ZendeskNotFound("HTTP-code: 404", None)
+    yield {'id': 'c{}'.format(ticket_id), 'created_at': '2021-10-11T12:23:20Z'}
+
+@patch('tap_zendesk.streams.LOGGER.warning')
+@patch('tap_zendesk.streams.Stream.update_bookmark')
+@patch('tap_zendesk.streams.Stream.get_bookmark')
+@patch('tap_zendesk.streams.CursorBasedExportStream.get_objects',
+       side_effect=lambda start_time: [dict(ticket) for ticket in TICKETS])
+@patch('tap_zendesk.streams.TicketAudits.get_objects', side_effect=mocked_audits)
+@patch('tap_zendesk.streams.TicketComments.get_objects', side_effect=mocked_comments)
+@patch('tap_zendesk.streams.TicketMetrics.get_objects_by_ticket', return_value={1: {'id': 'm1', 'ticket_id': 1}})
+@patch('tap_zendesk.streams.TicketAudits.stream', AUDITS_STREAM)
+@patch('tap_zendesk.streams.TicketMetrics.stream', METRICS_STREAM)
+@patch('tap_zendesk.streams.TicketComments.stream', COMMENTS_STREAM)
+@patch('tap_zendesk.streams.Tickets.stream', TICKETS_STREAM)
+@patch('singer.metrics.log')
+class TestTicketsSubStreamFetch(unittest.TestCase):
+    """
+    Test that the sub-stream records fetched on the executor are yielded in ticket order.
+    """
+    def test_sub_stream_records_yielded_in_order(self, mock_log, mock_metrics, mock_comments, mock_audits,
+                                                 mock_tickets, mock_get_bookmark, mock_update_bookmark, mock_logger):
+        state = {'bookmarks': {'tickets': {'generated_timestamp': '2021-10-01T00:00:00Z'}}}
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            tickets_stream = streams.Tickets(config={'subdomain': 'acme', 'access_token': 'token',
+                                                     'start_date': '2021-01-01T00:00:00Z', '_executor': executor})
+            records = list(tickets_stream.sync(state=state))
+
+        self.assertEqual(records, [
+            (TICKETS_STREAM, {'generated_timestamp': 1634027848, 'id': 1}),
+            (AUDITS_STREAM, {'id': 'a1', 'ticket_id': 1}),
+            (METRICS_STREAM, {'id': 'm1', 'ticket_id': 1}),
+            (COMMENTS_STREAM, {'id': 'c1', 'created_at': '2021-10-11T12:23:20Z', 'ticket_id': 1}),
+            (TICKETS_STREAM, {'generated_timestamp': 1634027849, 'id': 2}),
+            (AUDITS_STREAM, {'id': 'a2', 'ticket_id': 2}),
+        ])
+        # both tickets' metrics are requested at once
+        mock_metrics.assert_called_once_with([1, 2])
+        mock_logger.assert_any_call("Unable to retrieve metrics for ticket (ID: 2), record not found")
+        mock_logger.assert_any_call("Unable to retrieve comments for ticket (ID: 2), record not found")
+
+    def test_sub_stream_records_fetched_ahead(self, mock_log, mock_metrics, mock_comments, mock_audits,
+                                              mock_tickets, mock_get_bookmark, mock_update_bookmark, mock_logger):
+        for sub_stream_concurrency, expected_fetched in [(1, 1), (2, 2)]:
+            mock_audits.reset_mock()
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                tickets_stream = streams.Tickets(config={'subdomain': 'acme', 'access_token': 'token',
+                                                         'start_date': '2021-01-01T00:00:00Z', '_executor': executor,
+                                                         'sub_stream_concurrency': sub_stream_concurrency})
+                records = tickets_stream.sync(state={'bookmarks': {'tickets': {'generated_timestamp': '2021-10-01T00:00:00Z'}}})
+                # The first ticket is yielded once the audits of the look-ahead window are requested
+                self.assertEqual(next(records), (TICKETS_STREAM, {'generated_timestamp': 1634027848, 'id': 1}))
+                self.assertEqual(mock_audits.call_count, expected_fetched)
+                self.assertEqual(len(list(records)), 5)
+
+
+class TestTicketMetricsByTicket(unittest.TestCase):
+    """
+    Test that ticket metrics are sideloaded from the show_many endpoint for a batch of tickets.
+    """
+    @patch('tap_zendesk.http.call_api')
+    def test_metrics_sideloaded_for_batch(self, mock_call_api):
+        mock_call_api.return_value.json.return_value = {
+            'tickets': [{'id': 1}, {'id': 2}],
+            'metric_sets': [{'id': 'm1', 'ticket_id': 1}, {'id': 'm2', 'ticket_id': 2}]
+        }
+        metrics_stream = streams.TicketMetrics(config={'subdomain': 'acme', 'access_token': 'token'})
+
+        metrics_by_ticket = metrics_stream.get_objects_by_ticket([1, 2])
+
+        self.assertEqual(metrics_by_ticket, {1: {'id': 'm1', 'ticket_id': 1}, 2: {'id': 'm2', 'ticket_id': 2}})
+        self.assertEqual(mock_call_api.call_args[0][0], 'https://acme.zendesk.com/api/v2/tickets/show_many.json')
+        self.assertEqual(mock_call_api.call_args[1]['params'], {'ids': '1,2', 'include': 'metric_sets'})
+
+    def test_batch_size_is_capped(self):
+        self.assertEqual(streams.Tickets(config={'batch_size': '20'}).get_batch_size(), 20)
+        self.assertEqual(streams.Tickets(config={'batch_size': 500}).get_batch_size(), 100)
+        self.assertEqual(streams.Tickets(config={}).get_batch_size(), 100)